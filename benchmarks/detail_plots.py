@@ -0,0 +1,102 @@
+#! /usr/bin/env python
+""" Compare the per page cost of a new pyplot figure per detail page and of a reused DetailPlotRenderer """
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "pychromat"))
+import batch
+import report
+
+EXAMPLE_FOLDER = os.path.join(os.path.dirname(__file__), os.pardir, "example")
+CALIBRANTS = os.path.join(EXAMPLE_FOLDER, "20180516 IgG1_Calibrants.ref")
+ANALYTES = os.path.join(EXAMPLE_FOLDER, "20180516 IgG1_Analytes.ref")
+REPEAT = 3
+
+
+def detail_pages(folder):
+    """ Quantify the example files in folder and return the data of all their detail pages """
+    for file in glob.glob(os.path.join(EXAMPLE_FOLDER, "*ChA.txt")):
+        shutil.copy(file, folder)
+    settings = batch.BatchSettings(createFigure=True, deferFigures=True, processes=1)
+    batch.run(folder, CALIBRANTS, ANALYTES, settings)
+    pages = []
+    for file in sorted(glob.glob(os.path.join(folder, "*" + report.PAYLOAD_EXTENSION))):
+        pages.extend(report.loadPayload(file)['Details'])
+    return pages
+
+
+def new_figure(pdf, details):
+    """ Every page in a pyplot figure of its own, as plotIndividual did before the renderer was reused """
+    low, high = details['low'], details['high']
+    fwhm, NOBAN, height, residual, i = (details[key] for key in ('fwhm', 'NOBAN', 'height', 'residual', 'i'))
+    newX, newY = details['newData']
+    newGaussX, newGaussY = details['newGauss']
+    time, intensity = details['data']
+    maxIndex = low + int(np.argmax(intensity[low:high]))
+
+    fig = plt.figure(figsize=(8, 6))
+    fig.add_subplot(111)
+    plt.plot(time[low:high], intensity[low:high], 'b*')
+    plt.plot((newX[0], newX[-1]), (NOBAN['Background'], NOBAN['Background']), 'red')
+    plt.plot((newX[0], newX[-1]), (NOBAN['Background'] + NOBAN['Noise'], NOBAN['Background'] + NOBAN['Noise']),
+             color='green')
+    plt.plot(newX, newY, color='blue', linestyle='dashed')
+    plt.plot(newGaussX, newGaussY, color='green', linestyle='dashed')
+    plt.plot((time[maxIndex], time[maxIndex]), (NOBAN['Background'], intensity[maxIndex]), color='orange',
+             linestyle='dotted')
+    plt.plot((min(max(fwhm['center'] - fwhm['width'], newX[0]), newX[-1]),
+              max(min(fwhm['center'] + fwhm['width'], newX[-1]), newX[0])),
+             (height, height), color='red', linestyle='dashed')
+    plt.legend(['Raw Data', 'Background', 'Noise', 'Univariate Spline', 'Gaussian Fit (' + str(int(residual * 100)) +
+                '%)',
+                'Signal (S/N ' + str(round((intensity[maxIndex] - NOBAN['Background']) / NOBAN['Noise'], 1)) + ")",
+                "FWHM:" + "{0:.2f}".format(fwhm['fwhm'])], loc='best')
+    plt.title("Detail view: " + str(i[0]))
+    plt.xlabel("Retention Time [m]")
+    plt.ylabel("Intensity [au]")
+    pdf.savefig(fig)
+    plt.close(fig)
+
+
+def reused_figure(pdf, details):
+    report.plotIndividual(pdf, details)
+
+
+def render(folder, pages, function):
+    """ Return the time (in seconds) per page to render all pages into a report """
+    pdf = report.openReport(os.path.join(folder, "benchmark.pdf"), "benchmark", "benchmark")
+    begin = time.perf_counter()
+    for details in pages:
+        function(pdf, details)
+    elapsed = time.perf_counter() - begin
+    pdf.close()
+    return elapsed / len(pages)
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    try:
+        pages = detail_pages(folder)
+        # Warm up matplotlib (fonts, the renderer of this process) before timing
+        render(folder, pages[:1], reused_figure)
+        print("%d detail pages, best of %d" % (len(pages), REPEAT))
+        for name, function in (("new figure", new_figure), ("reused renderer", reused_figure)):
+            elapsed = min(render(folder, pages, function) for _ in range(REPEAT))
+            print("%-16s %8.2fms per page" % (name, elapsed * 1000))
+    finally:
+        report.resetDetailRenderer()
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
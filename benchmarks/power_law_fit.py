@@ -0,0 +1,85 @@
+#! /usr/bin/env python
+""" Compare the penalty based and the bounded power law calibration fits on the example calibrants """
+
+import glob
+import os
+import sys
+import timeit
+import warnings
+
+import numpy as np
+import scipy.optimize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "pychromat"))
+import batch
+import util
+from Trace import Trace
+
+EXAMPLE_FOLDER = os.path.join(os.path.dirname(__file__), os.pardir, "example")
+CALIBRANTS = os.path.join(EXAMPLE_FOLDER, "20180516 IgG1_Calibrants.ref")
+REPEAT = 20
+JITTER = 0.05
+JITTER_SETS = 50
+
+
+def penalty_fit(measured, expected):
+    """ The curve_fit of util.power_law, returns the parameters or None if the fit failed """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parameters = scipy.optimize.curve_fit(util.power_law, measured, expected)[0]
+    except RuntimeError:
+        return None
+    if not 0 <= parameters[1] <= 2:
+        return None
+    return parameters
+
+
+def bounded_fit(measured, expected):
+    """ The bounded least squares fit, returns the parameters or None if the fit failed """
+    f = util.fit_power_law(measured, expected)
+    return (f.a, f.b, f.c) if f.success else None
+
+
+def rms(parameters, measured, expected):
+    a, b, c = parameters
+    return np.sqrt(np.mean((a * measured ** b + c - expected) ** 2))
+
+
+def calibrant_sets():
+    """ Yield the name, measured and expected calibrant times of every example file """
+    settings = batch.BatchSettings()
+    refPeaks = batch.get_peak_list(CALIBRANTS, settings)
+    for file in sorted(glob.glob(os.path.join(EXAMPLE_FOLDER, "*ChA.txt"))):
+        trace = Trace.from_file(file).correct_baseline(settings.points, settings.baselineOrder)
+        expected, measured = zip(*batch.determineTimepairs(refPeaks, trace, settings))
+        yield os.path.basename(file), np.array(measured), np.array(expected)
+
+
+def main():
+    random = np.random.RandomState(0)
+    totals = {'penalty': [0, 0., 0], 'bounded': [0, 0., 0]}
+    print("%-35s %6s %10s %10s %12s %12s" % ("File", "Peaks", "penalty", "bounded", "penalty RMS", "bounded RMS"))
+    for name, measured, expected in calibrant_sets():
+        row = []
+        for method, fit in (('penalty', penalty_fit), ('bounded', bounded_fit)):
+            # Success rate on the calibrants themselves and on jittered copies of them
+            fits = [fit(measured, expected)]
+            for _ in range(JITTER_SETS):
+                fits.append(fit(measured + random.normal(0, JITTER, len(measured)), expected))
+            elapsed = min(timeit.repeat(lambda: fit(measured, expected), number=1, repeat=REPEAT))
+            totals[method][0] += sum(parameters is not None for parameters in fits)
+            totals[method][1] += elapsed
+            totals[method][2] += len(fits)
+            row.append((elapsed, fits[0]))
+        print("%-35s %6d %8.3fms %8.3fms %12s %12s" % (
+            name[:35], len(measured), row[0][0] * 1000, row[1][0] * 1000,
+            "failed" if row[0][1] is None else "%.3e" % rms(row[0][1], measured, expected),
+            "failed" if row[1][1] is None else "%.3e" % rms(row[1][1], measured, expected)))
+    for method, (succeeded, elapsed, count) in sorted(totals.items()):
+        print("%-8s %d/%d fits succeeded (calibrants jittered by %g), %.3fms in total" % (
+            method, succeeded, count, JITTER, elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+""" Compare the genfromtxt based reader, the single-pass reader and the parsed-trace cache on the example files """
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "pychromat"))
+import util
+from Trace import Trace
+
+EXAMPLE_FOLDER = os.path.join(os.path.dirname(__file__), os.pardir, "example")
+REPEAT = 20
+
+
+def genfromtxt_reader(file, x_col=0, y_col=2, sep="\t"):
+    header_length = 0
+    with open(file, 'r') as fr:
+        for line in fr:
+            if line[0].isdigit():
+                break
+            header_length += 1
+    return np.genfromtxt(file, delimiter=sep, skip_header=header_length, usecols=(x_col, y_col),
+                         dtype=Trace.DATA_TYPE)
+
+
+def main():
+    # The cached reads go to a temporary cache, the user's cache is left alone
+    util.cache.cache_dir = tempfile.mkdtemp()
+    try:
+        compare()
+    finally:
+        shutil.rmtree(util.cache.cache_dir)
+
+
+def compare():
+    print("%-45s %8s %12s %12s %12s" % ("File", "Points", "genfromtxt", "single-pass", "cached"))
+    for file in sorted(glob.glob(os.path.join(EXAMPLE_FOLDER, "*.txt"))):
+        old = genfromtxt_reader(file)
+        new = Trace.from_file(file, use_cache=False).data
+        cached = Trace.from_file(file, use_cache=True).data
+        assert np.array_equal(old, new) and np.array_equal(old, cached)
+
+        old_time = min(timeit.repeat(lambda: genfromtxt_reader(file), number=1, repeat=REPEAT))
+        new_time = min(timeit.repeat(lambda: Trace.from_file(file, use_cache=False), number=1, repeat=REPEAT))
+        cached_time = min(timeit.repeat(lambda: Trace.from_file(file, use_cache=True), number=1, repeat=REPEAT))
+        print("%-45s %8d %10.2fms %10.2fms %10.2fms" % (os.path.basename(file)[:45], len(new), old_time * 1000,
+                                                       new_time * 1000, cached_time * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,9 +13,9 @@ class Chromatogram(object):
         }
         self.last_trace = raw
 
-        self.time_units = "min"
-        self.intensity_metric = "Absorbance"
-        self.intensity_units = "mAU"
+        self.time_units = raw.metadata.get('x_units') or "min"
+        self.intensity_metric = raw.metadata.get('Signal Quantity') or "Absorbance"
+        self.intensity_units = raw.metadata.get('y_units') or "mAU"
 
     def x_range(self, trace="raw"):
         return self.traces[trace].x_range()
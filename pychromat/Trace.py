@@ -1,6 +1,6 @@
 import bisect
+import math
 import operator
-import sys
 import numpy as np
 import scipy
 import scipy.interpolate
@@ -11,34 +11,89 @@ import util
 
 class Trace(object):
     DATA_TYPE = np.dtype([('x', np.float64), ('y', np.float64)])
+    # Fits of the iterative peak detection whose centres plus or minus this many sigmas overlap are one peak
+    MERGE_SIGMA = 1.0
 
-    def __init__(self, data):
+    def __init__(self, data, metadata=None):
         self.data = data
         self.x = data['x']
         self.y = data['y']
+        self.metadata = metadata or {}
 
     @classmethod
-    def from_xy(cls, x, y):
-        data = np.zeros(len(x), dtype=cls.DATA_TYPE)
+    def from_xy(cls, x, y, filename=None):
+        """Create a new Trace from x and y values.
+
+        When a filename is given the data is allocated in a .npy file on
+        disk (see from_memmap) instead of in memory.
+        """
+        if filename is None:
+            data = np.zeros(len(x), dtype=cls.DATA_TYPE)
+        else:
+            data = np.lib.format.open_memmap(filename, mode='w+', dtype=cls.DATA_TYPE, shape=(len(x),))
         data['x'] = x
         data['y'] = y
         return cls(data)
 
+    @classmethod
+    def from_memmap(cls, filename, mode='r'):
+        """Open a Trace backed by a memory mapped .npy file.
+
+        The data is not read into memory; pages are only loaded when they
+        are accessed, e.g. by window(). Use mode 'r+' to allow in place
+        modification of the file.
+        """
+        return cls(np.load(filename, mmap_mode=mode))
+
+    def to_memmap(self, filename):
+        """ Write the data to a .npy file and return a Trace backed by it """
+        data = np.lib.format.open_memmap(filename, mode='w+', dtype=self.DATA_TYPE, shape=self.data.shape)
+        data[:] = self.data
+        data.flush()
+        del data
+        return self.__class__(np.load(filename, mmap_mode='r'), self.metadata)
+
+    def is_memmap(self):
+        return isinstance(self.data, np.memmap)
+
     @classmethod
     def from_file_txt(cls, file, x_col=0, y_col=1, sep="\t"):
-        header_length = 0
-        with open(file, 'r') as fr:
-            for line in fr:
-                if line[0].isdigit():
-                    break
-                header_length += 1
+        data, metadata = util.read_text_export(file, cls.DATA_TYPE, x_col, y_col, sep)
+        return cls(data, metadata)
 
-        data = np.genfromtxt(file, delimiter=sep, skip_header=header_length, usecols=(x_col, y_col), dtype=cls.DATA_TYPE)
+    def write_txt(self, file, decimals=6, sep="\t"):
+        """Write the trace as a two column text file.
 
-        return cls(data)
+        All lines are formatted in a single string formatting operation
+        instead of formatting every value separately.
+        """
+        line = sep.join(["%." + str(decimals) + "f"] * 2) + "\n"
+        values = np.column_stack((self.x, self.y)).ravel().tolist()
+        with open(file, 'w') as fw:
+            fw.write((line * len(self.x)) % tuple(values))
 
     @classmethod
-    def from_file(cls, file):
+    def from_file(cls, file, use_cache=None):
+        """Read a raw data file, using the parsed-trace cache when enabled.
+
+        Keyword arguments:
+        file -- path of the raw data file
+        use_cache -- overrides util.cache.enabled when not None
+        """
+        if use_cache is None:
+            use_cache = util.cache.enabled
+        if use_cache:
+            cached = util.cache.load(file)
+            if cached is not None:
+                return cls(*cached)
+
+        trace = cls.parse_file(file)
+        if use_cache and trace is not None:
+            util.cache.store(file, trace.data, trace.metadata)
+        return trace
+
+    @classmethod
+    def parse_file(cls, file):
         if '.txt' in file:
             return cls.from_file_txt(file, x_col=0, y_col=2)
         elif '.csv' in file:
@@ -48,6 +103,17 @@ class Trace(object):
         else:
             print("Incorrect input file format, please choose a raw data 'txt' or 'arw' file.")
 
+    def window(self, t0, t1):
+        """Return a Trace of the data points with t0 <= x <= t1.
+
+        The window is located with a binary search over x and returned as a
+        view on the data, so for a memory mapped Trace only the pages that
+        are touched by the search and the window itself are read.
+        """
+        low = bisect.bisect_left(self.x, t0)
+        high = bisect.bisect_right(self.x, t1)
+        return self.__class__(self.data[low:high], self.metadata)
+
     def x_range(self):
         return min(self.x), max(self.x)
 
@@ -58,24 +124,20 @@ class Trace(object):
         """Return the background and noise.
 
         This function determines the average and the standard deviation or
-        the maximum difference of all segments of data, where each segmwent
-        has the length specified in the slice points parameter.
+        the maximum difference of all segments of data, where each segment
+        has the length specified in the slice points parameter, and returns
+        those of the segment with the lowest average.
+        """
+        return util.background_noise(self.y, slice_points, noise_method)
+
+    def background_noise_profile(self, slice_points=5):
+        """Return the rolling background and noise of all segments.
+
+        Returns a structured array with the 'background' (average), 'rms'
+        and 'mm' (maximum difference) of every segment of slice_points data
+        points, where element i describes the segment starting at x[i].
         """
-        background = sys.maxsize
-        noise = 0
-        for index in range(len(self.data) - slice_points):
-            segment = self.y[index:(index + slice_points)]
-
-            if np.mean(segment) < background:
-                background = np.mean(segment)
-
-                if noise_method == "MM":
-                    noise = max(segment) - min(segment)
-                elif noise_method == "RMS":
-                    noise = np.std(segment)
-        if noise == 0:
-            noise = 1
-        return background, noise
+        return util.rolling_background_noise(self.y, slice_points)
 
     def smooth(self, window_length=21, order=3):
         """ Returns a new Trace which has been smoothed """
@@ -113,173 +175,70 @@ class Trace(object):
         new_y -= min(new_y)
         return Trace.from_xy(self.x, new_y)
 
-    def detect_peaks(self, peak_detection_min=0.001, peak_detection_edge="FWHM", peakDetectionEdgeValue=1):
+    def detect_peaks(self, peak_detection_min=0.001, peak_detection_edge="FWHM", peakDetectionEdgeValue=1,
+                     method="iterative", output=None):
         """Detect all peaks in the currently active chromatogram.
 
-        This function performs peak detection by fitting a Gaussian function
-        through the highest data points in a chromatogram. The fitted
-        function is then subtracted from the original data to yield a
-        chromatogram without the removed analyte, after which this process
-        is repeated until the highest datapoint falls below the specified
-        cut-off (determined by comparing the intensity of the most intense
-        analyte in the original data with the intensity of the most intense
-        analyte in the current (residual) data).
-
-        The peak detection is based on the assumption that the first
+        The "iterative" method performs peak detection by fitting a
+        Gaussian function through the highest data points in a
+        chromatogram. The fitted function is then subtracted from the
+        original data to yield a chromatogram without the removed analyte,
+        after which this process is repeated until the highest datapoint
+        falls below the specified cut-off (determined by comparing the
+        intensity of the most intense analyte in the original data with the
+        intensity of the most intense analyte in the current (residual)
+        data). The peak detection is based on the assumption that the first
         derivative of the data is 0 at a local maxima or minima.
-        """
-
-        # Determine the background
-        background, noise = self.background_noise()
-
-        # Determine the local maxima and minima, using first order derivative
-        f = scipy.interpolate.InterpolatedUnivariateSpline(self.x, self.y)
-        f_prime = f.derivative()
-
-        new_x = np.linspace(self.x[0], self.x[-1], 25000 * (self.x[-1] - self.x[0]))
-        new_y = f(new_x)
-        new_prime_y = f_prime(new_x)
-        maxima = scipy.signal.argrelextrema(new_prime_y, np.greater)
-        minima = scipy.signal.argrelextrema(new_prime_y, np.less)
-        breaks = maxima[0].tolist() + minima[0].tolist()
-        breaks = sorted(breaks)
-
-        # Determine the maximum full peak, for the cut-off
-        max_intensity = 0
-        for func in range(0, len(breaks) - 2):
-            max_intensity = max(max(new_y[breaks[func]:breaks[func + 1]]), max_intensity)
-        cutoff = peak_detection_min * (max_intensity - max(background, 0))
-
-        # Detect peaks
-        functions = []
-        counter = 0
-        x_data = new_x.copy()
-        y_data = new_y.copy()
-        while (max(y_data) - background) > cutoff:
-            counter += 1
-            print("Fitting peak: " + str(counter))
 
-            f = scipy.interpolate.InterpolatedUnivariateSpline(x_data, y_data)
-            f_prime = f.derivative()
-            new_y = f(new_x)
-            new_prime_y = f_prime(new_x)
-            maxima = scipy.signal.argrelextrema(new_prime_y, np.greater)
-            minima = scipy.signal.argrelextrema(new_prime_y, np.less)
-            breaks = maxima[0].tolist() + minima[0].tolist()
-            breaks = sorted(breaks)
-            print('b0 = ' + str(breaks[0]))
-
-            # Subset the data
-            max_point = 0
-            # # Region from new_y[0] to breaks[0]
-            # print(len(x_data))
-            # try:
-            #     if max(new_y[0:breaks[0]]) > max_point:
-            #         max_point = max(new_y[0:breaks[0]])
-            #         x_data = new_x[0:breaks[0]]
-            #         y_data = new_y[0:breaks[0]] - background
-            # except IndexError:
-            #     pass
-            # print(len(x_data))
-            # # Regions between breaks[x] and breaks[x+1]
-            # try:
-            #     for index, j in enumerate(breaks):
-            #         if max(new_y[breaks[index]:breaks[index + 1]]) > max_point:
-            #             pass
-            #             max_point = max(new_y[breaks[index]:breaks[index + 1]])
-            #             x_data = new_x[breaks[index]:breaks[index + 1]]
-            #             y_data = new_y[breaks[index]:breaks[index + 1]] - max(background, 0)
-            # except IndexError:
-            #     pass
-            # print(len(x_data))
-            # # Region from break[-1] to newY[-1]
-            # try:
-            #     if max(new_y[breaks[-1]:-1]) > max_point:
-            #         max_point = max(new_y[breaks[-1]:-1])
-            #         x_data = new_x[breaks[-1]:-1]
-            #         y_data = new_y[breaks[-1]:-1] - background
-            # except IndexError:
-            #     pass
-
-            print(len(x_data))
-
-            # Gaussian fit on main points
-            peak = x_data[y_data > np.exp(-0.5) * max(y_data)]
-            guess_sigma = 0.5 * (max(peak) - min(peak))
-
-            p0 = (np.max(y_data), x_data[np.argmax(y_data)], guess_sigma)
-            print(p0)
-            coeff, var_matrix = scipy.optimize.curve_fit(util.gauss_function, x_data, y_data, p0)
-            new_gauss_x = np.linspace(x_data[0], x_data[-1], 2500 * (x_data[-1] - x_data[0]))
-            new_gauss_y = util.gauss_function(new_gauss_x, *coeff)
-
-            # Limit the peak to either FWHM or a user specified Sigma value
-            if peak_detection_edge == "FWHM":
-                hwhm = util.hwhm(coeff)
-                low = bisect.bisect_left(new_gauss_x, coeff[1] - hwhm)
-                high = bisect.bisect_right(new_gauss_x, coeff[1] + hwhm)
-                new_gauss_x = new_gauss_x[low:high]
-                new_gauss_y = new_gauss_y[low:high]
-
-            elif peak_detection_edge == "Sigma":
-                low = bisect.bisect_left(new_gauss_x, coeff[1] - peakDetectionEdgeValue * abs(coeff[2]))
-                high = bisect.bisect_right(new_gauss_x, coeff[1] + peakDetectionEdgeValue * abs(coeff[2]))
-                try:
-                    new_gauss_x = new_gauss_x[low:high]
-                    new_gauss_y = new_gauss_y[low:high]
-                except:
-                    pass
-
-            # Ignore breaks (f'(x) == 0) that did not match any data (reword this)
-            if new_gauss_x.any():
-                data = np.zeros(len(new_gauss_x), dtype=self.DATA_TYPE)
-                data['x'] = new_gauss_x
-                data['y'] = new_gauss_y
-                functions.append({
-                    'Peak': new_gauss_x[np.argmax(new_gauss_y)],
-                    'Data': data,
-                    'FWHM': util.fwhm(coeff)
-                })
-
-            # Subtract the fitted Gaussian from the raw or intermediate data and repeat the peak detection step.
-            gauss_y = util.gauss_function(x_data, *coeff)
-            new_y = y_data - gauss_y
-            if max(new_y) == max(y_data):
-                break
-            y_data = new_y
+        The "cluster" method groups the local maxima into clusters of
+        overlapping peaks and fits every cluster jointly with a sum of
+        Gaussians, using only the data of that cluster (see
+        _detect_peaks_cluster).
+
+        The "fast" method does not fit at all, it picks the maxima of the
+        smoothed chromatogram with scipy.signal.find_peaks and measures
+        their width directly (see _detect_peaks_fast). It takes a few
+        milliseconds and is meant for quick annotation.
+
+        The detected peaks are returned as a list of dicts, containing Peak,
+        Data and FWHM, sorted by Peak, and written to output (an annotation
+        file such as annotation.ref) when it is given.
+
+        Keyword arguments:
+        peak_detection_min -- cut-off, as a fraction of the most intense peak
+        peak_detection_edge -- limit the peaks to either the "FWHM" or a number of "Sigma"
+        peakDetectionEdgeValue -- number of sigma used by the "Sigma" edge
+        method -- either "iterative", "cluster" or "fast"
+        output -- path of the annotation file, or None to not write one
+        """
+        if method == "fast":
+            functions = self._detect_peaks_fast(peak_detection_min, peak_detection_edge, peakDetectionEdgeValue)
+            overlap_detected = False
+        elif method == "cluster":
+            functions = self._detect_peaks_cluster(peak_detection_min, peak_detection_edge, peakDetectionEdgeValue)
+            overlap_detected = False
+        elif method == "iterative":
+            functions, overlap_detected = self._detect_peaks_iterative(peak_detection_min, peak_detection_edge,
+                                                                       peakDetectionEdgeValue)
+        else:
+            raise ValueError("Unknown peak detection method: " + str(method))
 
         functions = sorted(functions, key=lambda d: d['Peak'])
 
-
-        # iterate over all peaks and remove overlap
-        overlap_detected = False
-        for index, func in enumerate(functions):
-            if (index+1) < len(functions) and len(func['Data']) > 0 and func['Data'][-1]['x'] > functions[index + 1]['Data'][0]['x']:
-                overlap_detected = True
-                overlap = abs(functions[index + 1]['Data'][0]['x'] - func['Data'][-1]['x'])
-                peak1 = max(func['Data']['y'])
-                peak2 = max(functions[index + 1]['Data']['y'])
-                peak1fraction = (peak1 / (peak1 + peak2)) * overlap
-                peak2fraction = (peak2 / (peak1 + peak2)) * overlap
-                low = bisect.bisect_right(func['Data']['x'], func['Data'][-1]['x'] - peak2fraction)
-                high = bisect.bisect_left(functions[index + 1]['Data']['x'],
-                                          functions[index + 1]['Data'][0]['x'] + peak1fraction)
-                func['Data'] = func['Data'][0:low]
-                functions[index + 1]['Data'] = functions[index + 1]['Data'][high:-1]
-
         # Determine calibrants
         # calibrants = determineCalibrants(functions)
 
-        # Writing to temp folder
-        with open('annotation.ref', 'w') as fw:
-            fw.write("Peak\tRT\tWindow\n")
-            for index, analyte in enumerate(functions):
-                if len(analyte['Data']) > 0:
-                    window = 0.5 * (float(analyte['Data'][-1]["x"]) - float(analyte['Data'][0]["x"]))
-                    center = float(analyte['Data'][0]["x"]) + 0.5 * window
-                    fw.write(str("%.2f" % analyte['Peak']) + "\t" +
-                             str("%.2f" % center) + "\t" +
-                             str("%.2f" % window) + "\n")
+        # Writing the annotation file
+        if output is not None:
+            with open(output, 'w') as fw:
+                fw.write("Peak\tRT\tWindow\n")
+                for index, analyte in enumerate(functions):
+                    if len(analyte['Data']) > 0:
+                        window = 0.5 * (float(analyte['Data'][-1]["x"]) - float(analyte['Data'][0]["x"]))
+                        center = float(analyte['Data'][0]["x"]) + 0.5 * window
+                        fw.write(str("%.2f" % analyte['Peak']) + "\t" +
+                                 str("%.2f" % center) + "\t" +
+                                 str("%.2f" % window) + "\n")
 
         # with open('calibrants.ref', 'w') as fw:
         #     fw.write("Peak\tRT\tWindow\n")
@@ -321,3 +280,288 @@ class Trace(object):
             #                             "detected peaks. PyChromat has attempted to automatically re-adjust the borders to capture the " +
             #                             "largest possible portion of the analytes, based on their signal intensities. However, please feel " +
             #                             "free to manually re-adjust the signals if desired in the peak list.")
+        return functions
+
+    def _detect_peaks_iterative(self, peak_detection_min, peak_detection_edge, peakDetectionEdgeValue):
+        """ Detect peaks by repeatedly fitting and subtracting a single Gaussian (see detect_peaks) """
+
+        # Determine the background
+        background, noise = self.background_noise()
+
+        # Determine the local maxima and minima, using first order derivative
+        f = scipy.interpolate.InterpolatedUnivariateSpline(self.x, self.y)
+        new_x, breaks = util.insert_points(util.resample(self.x), util.inflection_points(f))
+        new_y = f(new_x)
+        breaks = breaks.tolist()
+
+        # Determine the maximum full peak, for the cut-off
+        max_intensity = 0
+        for func in range(0, len(breaks) - 2):
+            max_intensity = max(max(new_y[breaks[func]:breaks[func + 1]]), max_intensity)
+        cutoff = peak_detection_min * (max_intensity - max(background, 0))
+
+        # Detect peaks, the maximum of the residual is tracked by a segment
+        # tree so that every subtraction only updates its own neighbourhood
+        fits = []
+        counter = 0
+        x_data = new_x
+        y_data = new_y.copy()
+        residual = util.MaxSegmentTree(y_data)
+        while (residual.max() - background) > cutoff:
+            counter += 1
+            print("Fitting peak: " + str(counter))
+
+            # Gaussian fit on main points, around the highest point only
+            top = residual.argmax()
+            left, right = self._half_height_run(y_data, top, np.exp(-0.5) * y_data[top])
+            guess_sigma = max(0.5 * (x_data[right] - x_data[left]), x_data[min(top + 1, len(x_data) - 1)] -
+                              x_data[top])
+            p0 = (y_data[top], x_data[top], guess_sigma)
+            low = bisect.bisect_left(x_data, x_data[top] - 4 * guess_sigma)
+            high = bisect.bisect_right(x_data, x_data[top] + 4 * guess_sigma)
+            try:
+                coeff = util.fit_gaussian(x_data[low:high], y_data[low:high], p0, maxfev=400, timeout=1.0)
+            except (RuntimeError, TypeError):
+                coeff = p0
+            fits.append((coeff, x_data[low], x_data[high - 1]))
+
+            # Subtract the fitted Gaussian from the intermediate data (where it is not negligible) and repeat the
+            # peak detection step.
+            previous = residual.max()
+            low = bisect.bisect_left(x_data, coeff[1] - 5 * abs(coeff[2]))
+            high = bisect.bisect_right(x_data, coeff[1] + 5 * abs(coeff[2]))
+            y_data[low:high] -= util.gauss_function(x_data[low:high], *coeff)
+            residual.update(low, y_data[low:high])
+            if residual.max() == previous:
+                break
+
+        # A local fit can leave part of its peak in the residual, which is then fitted again within the extent of
+        # the first fit; those fits are a single peak
+        resolution = (self.x[-1] - self.x[0]) / max(len(self.x) - 1, 1)
+        functions = []
+        for coeff, x0, x1 in self._merge_fits(fits, self.MERGE_SIGMA, resolution):
+            function = self._peak_function(coeff, x0, x1, peak_detection_edge, peakDetectionEdgeValue)
+            if function is not None:
+                functions.append(function)
+        functions = sorted(functions, key=lambda d: d['Peak'])
+
+        # iterate over all peaks and remove overlap
+        overlap_detected = False
+        for index, func in enumerate(functions):
+            if (index+1) < len(functions) and len(func['Data']) > 0 and func['Data'][-1]['x'] > functions[index + 1]['Data'][0]['x']:
+                overlap_detected = True
+                overlap = abs(functions[index + 1]['Data'][0]['x'] - func['Data'][-1]['x'])
+                peak1 = max(func['Data']['y'])
+                peak2 = max(functions[index + 1]['Data']['y'])
+                peak1fraction = (peak1 / (peak1 + peak2)) * overlap
+                peak2fraction = (peak2 / (peak1 + peak2)) * overlap
+                low = bisect.bisect_right(func['Data']['x'], func['Data'][-1]['x'] - peak2fraction)
+                high = bisect.bisect_left(functions[index + 1]['Data']['x'],
+                                          functions[index + 1]['Data'][0]['x'] + peak1fraction)
+                func['Data'] = func['Data'][0:low]
+                functions[index + 1]['Data'] = functions[index + 1]['Data'][high:-1]
+        return functions, overlap_detected
+
+    @staticmethod
+    def _merge_fits(fits, fraction, resolution=0.):
+        """Merge the Gaussian fits whose extents overlap.
+
+        The extent of a fit is its centre plus or minus fraction times its
+        sigma, but at least the resolution (the sampling interval), as a
+        narrower fit is not resolved by the data. The fits are taken in
+        order of their centre and a fit is merged into the current peak
+        when their extents overlap (and both are positive). A merged peak
+        is the Gaussian with the same area, mean and variance as the sum of
+        its fits, and spans the range of all its fits. As merging widens a
+        peak, this is repeated until no more peaks merge.
+
+        Returns a list of (coeff, x0, x1) tuples.
+
+        Keyword arguments:
+        fits -- list of (coeff, x0, x1) tuples, the a, mu and sigma of a fit and the range it was fitted on
+        fraction -- half width of the extent of a fit, in sigmas
+        resolution -- minimum half width of the extent of a fit
+        """
+
+        def extent(sigma):
+            return max(fraction * sigma, resolution)
+
+        peaks = [((coeff[0], coeff[1], abs(coeff[2])), x0, x1) for coeff, x0, x1 in fits]
+        count = None
+        while count != len(peaks):
+            count = len(peaks)
+            merged = []
+            for (a, mu, sigma), x0, x1 in sorted(peaks, key=lambda peak: peak[0][1]):
+                if (merged and a > 0 and merged[-1][0][0] > 0 and
+                        abs(mu - merged[-1][0][1]) < extent(merged[-1][0][2]) + extent(sigma)):
+                    # Moments of the sum of both Gaussians (area, mean and mean square)
+                    (b, nu, tau), y0, y1 = merged.pop()
+                    areas = (a * sigma, b * tau)
+                    total = sum(areas)
+                    centre = (areas[0] * mu + areas[1] * nu) / total
+                    square = (areas[0] * (sigma ** 2 + mu ** 2) + areas[1] * (tau ** 2 + nu ** 2)) / total
+                    width = math.sqrt(max(square - centre ** 2, 0)) or max(sigma, tau)
+                    merged.append(((total / width, centre, width), min(x0, y0), max(x1, y1)))
+                else:
+                    merged.append(((a, mu, sigma), x0, x1))
+            peaks = merged
+        return peaks
+
+    @staticmethod
+    def _half_height_run(y, index, level, chunk=64):
+        """Return the first and last index of the run of y > level around index.
+
+        The run is searched in chunks that double in size, so only the
+        neighbourhood of the peak is inspected.
+        """
+        bounds = []
+        for direction in (-1, 1):
+            position = index
+            while True:
+                if direction < 0:
+                    segment = y[max(position - chunk, 0):position][::-1]
+                else:
+                    segment = y[position + 1:position + 1 + chunk]
+                below = np.flatnonzero(segment <= level)
+                if len(below) or len(segment) < chunk:
+                    steps = below[0] if len(below) else len(segment)
+                    bounds.append(position + direction * steps)
+                    break
+                position += direction * chunk
+                chunk *= 2
+        return bounds[0], bounds[1]
+
+    def _detect_peaks_cluster(self, peak_detection_min, peak_detection_edge, peakDetectionEdgeValue):
+        """Detect peaks by jointly fitting clusters of overlapping peaks.
+
+        The candidate peaks are the local maxima that rise more than the
+        cut-off above the background and have a prominence of at least
+        three times the noise, where the background and noise of the whole
+        trace are determined with NOBAN (the segments of the MT method are
+        too short to capture the noise of a full trace). The half height width of each candidate
+        gives an initial sigma, after which candidates whose 3 sigma
+        ranges overlap are grouped into a cluster. Every cluster is then
+        fitted with a sum of Gaussians (with an analytic Jacobian) on the
+        data of that cluster alone, which replaces the subtract-and-refit
+        loop over the whole trace and the trimming of overlapping peaks.
+        """
+        noban = util.noban(self.y)
+        background, noise = noban['Background'], noban['Noise']
+        x = np.asarray(self.x, dtype=np.float64)
+        y = np.asarray(self.y, dtype=np.float64)
+        cutoff = peak_detection_min * (np.max(y) - max(background, 0))
+        candidates, _ = scipy.signal.find_peaks(y, height=background + cutoff, prominence=3 * noise)
+        if len(candidates) == 0:
+            return []
+        step = np.median(np.diff(x))
+        widths = scipy.signal.peak_widths(y, candidates, rel_height=0.5)[0]
+        sigmas = np.maximum(widths * step / (2 * math.sqrt(2 * math.log(2))), step)
+
+        # Group the candidates into clusters of overlapping peaks
+        separate = np.diff(x[candidates]) > 3 * (sigmas[:-1] + sigmas[1:])
+        clusters = np.split(np.arange(len(candidates)), np.flatnonzero(separate) + 1)
+
+        functions = []
+        for cluster in clusters:
+            mus = x[candidates[cluster]]
+            low = bisect.bisect_left(x, mus[0] - 3 * sigmas[cluster[0]])
+            high = bisect.bisect_right(x, mus[-1] + 3 * sigmas[cluster[-1]])
+            x_data = x[low:high]
+            y_data = y[low:high] - background
+            p0 = np.column_stack((y[candidates[cluster]] - background, mus, sigmas[cluster])).ravel()
+            lower = np.tile([0, x_data[0], step / 2], len(cluster))
+            upper = np.tile([np.inf, x_data[-1], x_data[-1] - x_data[0]], len(cluster))
+            try:
+                coeff, var_matrix = scipy.optimize.curve_fit(util.multi_gauss_function, x_data, y_data,
+                                                             np.clip(p0, lower, upper), bounds=(lower, upper),
+                                                             jac=util.multi_gauss_jacobian)
+            except (RuntimeError, ValueError):
+                coeff = p0
+            for index in range(0, len(coeff), 3):
+                function = self._peak_function(coeff[index:index + 3], x_data[0], x_data[-1], peak_detection_edge,
+                                               peakDetectionEdgeValue)
+                if function is not None:
+                    functions.append(function)
+        return functions
+
+    def _detect_peaks_fast(self, peak_detection_min, peak_detection_edge, peakDetectionEdgeValue, slice_points=5):
+        """Detect peaks as the maxima of the smoothed chromatogram.
+
+        The chromatogram is smoothed with the Savitzky-Golay filter of
+        smooth(), after which scipy.signal.find_peaks selects the maxima
+        that rise more than the cut-off above the background, have a
+        prominence of at least three times the noise and are at least as
+        wide as a background segment (slice_points), as narrower features
+        can not be told apart from the noise. As in _detect_peaks_cluster,
+        the background and noise of the whole trace are determined with
+        NOBAN, the noise of the lowest MT segment is far below that of a
+        full trace. The FWHM and the edges of every peak are measured on the
+        smoothed data, the data of a peak is the smoothed data between its
+        edges.
+        """
+        noban = util.noban(self.y)
+        background, noise = noban['Background'], noban['Noise']
+        x = np.asarray(self.x, dtype=np.float64)
+        smoothed = self.smooth().y
+        cutoff = peak_detection_min * (np.max(smoothed) - max(background, 0))
+        peaks, properties = scipy.signal.find_peaks(smoothed, height=background + cutoff, prominence=3 * noise,
+                                                    width=slice_points)
+        if len(peaks) == 0:
+            return []
+        widths, heights, left, right = scipy.signal.peak_widths(smoothed, peaks, rel_height=0.5)
+        indices = np.arange(len(x))
+        fwhms = np.interp(right, indices, x) - np.interp(left, indices, x)
+
+        functions = []
+        for index, peak in enumerate(peaks):
+            if peak_detection_edge == "Sigma":
+                sigma = fwhms[index] / (2 * math.sqrt(2 * math.log(2)))
+                low = bisect.bisect_left(x, x[peak] - peakDetectionEdgeValue * sigma)
+                high = bisect.bisect_right(x, x[peak] + peakDetectionEdgeValue * sigma)
+            else:
+                low = int(math.ceil(left[index]))
+                high = int(math.floor(right[index])) + 1
+            data = np.zeros(high - low, dtype=self.DATA_TYPE)
+            data['x'] = x[low:high]
+            data['y'] = smoothed[low:high]
+            functions.append({
+                'Peak': x[peak],
+                'Data': data,
+                'FWHM': fwhms[index]
+            })
+        return functions
+
+    def _peak_function(self, coeff, x0, x1, peak_detection_edge="FWHM", peakDetectionEdgeValue=1):
+        """Return the Peak, Data and FWHM dict of a fitted Gaussian.
+
+        The Gaussian is evaluated between x0 and x1 and limited to either
+        the FWHM or a user specified sigma value, None is returned if no
+        data points remain.
+        """
+        new_gauss_x = np.linspace(x0, x1, int(2500 * (x1 - x0)))
+        new_gauss_y = util.gauss_function(new_gauss_x, *coeff)
+
+        # Limit the peak to either FWHM or a user specified Sigma value
+        if peak_detection_edge == "FWHM":
+            hwhm = util.hwhm(coeff)
+            low = bisect.bisect_left(new_gauss_x, coeff[1] - hwhm)
+            high = bisect.bisect_right(new_gauss_x, coeff[1] + hwhm)
+            new_gauss_x = new_gauss_x[low:high]
+            new_gauss_y = new_gauss_y[low:high]
+        elif peak_detection_edge == "Sigma":
+            low = bisect.bisect_left(new_gauss_x, coeff[1] - peakDetectionEdgeValue * abs(coeff[2]))
+            high = bisect.bisect_right(new_gauss_x, coeff[1] + peakDetectionEdgeValue * abs(coeff[2]))
+            new_gauss_x = new_gauss_x[low:high]
+            new_gauss_y = new_gauss_y[low:high]
+
+        # Ignore breaks (f'(x) == 0) that did not match any data (reword this)
+        if not new_gauss_x.any():
+            return None
+        data = np.zeros(len(new_gauss_x), dtype=self.DATA_TYPE)
+        data['x'] = new_gauss_x
+        data['y'] = new_gauss_y
+        return {
+            'Peak': new_gauss_x[np.argmax(new_gauss_y)],
+            'Data': data,
+            'FWHM': util.fwhm(coeff)
+        }
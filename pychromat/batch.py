@@ -0,0 +1,770 @@
+#! /usr/bin/env python
+"""Headless batch processing.
+
+This module calibrates and quantifies all chromatograms in a folder and
+combines the results into a summary file, without any GUI. It never
+imports tkinter or pyplot, so it can be used on servers and from cron,
+either via run() or from the command line ('pychromat batch --help').
+"""
+
+import argparse
+import bisect
+import functools
+import glob
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+from scipy.interpolate import InterpolatedUnivariateSpline
+
+import util
+from Trace import Trace
+from util import calibration, parallel, quantitation
+
+# Defines
+version = "0.0.1"
+EXCLUSION_FILES = ["LICENSE.txt", "CHANGELOG.txt"]
+CALIBRATION_FILETYPES = ["*.txt", "*.arw"]
+INTEGRATION_FILETYPES = ["calibrated*.txt"]
+RESULTS_FILE = "results.npz"
+# Number of consecutive files that share a calibration warm start
+WARM_START_BLOCK = 8
+SUMMARY_CHUNK = 1024
+# Grid points per analyte window (half width) to resample the spline on, the 375 points of a 0.15 minute window
+# are the 2500 points per minute the quantitation has always used
+WINDOW_POINTS = 375
+
+class BatchSettings(object):
+    """Settings of a batch run.
+
+    The defaults match those of gui.settings, any of them can be
+    overridden with keyword arguments or read from a settings file
+    (the 'name:<tab>value' format of PyChromat.ini).
+    """
+
+    def __init__(self, **kwargs):
+        # General
+        self.start = 10
+        self.end = 60
+        self.points = 100
+        self.baselineOrder = 1
+        self.decimalNumbers = 6
+        self.processes = None
+
+        # Background and noise
+        self.backgroundWindow = 1
+        self.backgroundNoiseMethod = "MT"
+        self.noise = "RMS"
+        self.slicepoints = 5
+        self.nobanStart = 0.25
+
+        # Calibration
+        self.minPeaks = 4
+        self.minPeakSN = 27
+        self.min_improvement = 0.05
+        self.use_interpolation = False
+        self.warmStart = False
+
+        # Input
+        self.traceCache = util.cache.enabled
+
+        # Quantitation
+        self.fitMaxfev = 400
+        self.fitTimeout = 1.0
+
+        # Output
+        self.createFigure = False
+        self.deferFigures = False
+        self.writeCalibrated = False
+        self.output = "summary.results"
+        self.database = None
+        self.absInt = True
+        self.relInt = True
+        self.bckSub = True
+        self.bckNoise = True
+        self.peakQual = True
+
+        # Logging
+        self.logFile = None
+        self.logLevel = 1
+
+        for key, value in kwargs.items():
+            if not hasattr(self, key):
+                raise TypeError("Unknown setting: " + str(key))
+            setattr(self, key, value)
+
+    @classmethod
+    def from_file(cls, fileName):
+        """ Read the settings from a PyChromat.ini style file """
+        settings = cls()
+        with open(fileName, 'r') as fr:
+            for line in fr:
+                chunks = line.strip('\n').split('\t')
+                key = chunks[0].rstrip(':')
+                if len(chunks) > 1 and hasattr(settings, key):
+                    setattr(settings, key, _parse_value(getattr(settings, key), chunks[1]))
+        return settings
+
+    @classmethod
+    def from_module(cls, module, **kwargs):
+        """ Copy the settings from a settings module (e.g. gui.settings) """
+        settings = cls()
+        for key in vars(settings):
+            if hasattr(module, key):
+                setattr(settings, key, getattr(module, key))
+        for key, value in kwargs.items():
+            setattr(settings, key, value)
+        return settings
+
+
+def _parse_value(default, value):
+    if isinstance(default, bool):
+        return value.strip().lower() in ("true", "1", "yes")
+    elif isinstance(default, int):
+        return int(value)
+    elif isinstance(default, float):
+        return float(value)
+    elif default is None:
+        return int(value) if value.strip().isdigit() else (value or None)
+    return value
+
+
+def log(settings, level, message):
+    """ Append a timestamped message to the log file (if logging at this level) """
+    if settings.logFile and settings.logLevel >= level:
+        with open(settings.logFile, 'a') as fw:
+            fw.write(str(datetime.now().replace(microsecond=0)) + "\t" + message + "\n")
+
+
+def get_peak_list(fileName, settings):
+    """Read and parse the peak file and return a list of peaks.
+
+    This function opens the file that is specified in 'fileName', and
+    reads it on a line per line basis. The function will split each
+    line on '\\t' prior to trying to append the (name, time, window)
+    tuple to the 'peaks' list. Lines that can not be parsed are logged
+    and ignored.
+
+    Keyword argments:
+    fileName -- string
+    settings -- BatchSettings
+    """
+    peaks = []
+    with open(fileName, 'r') as fr:
+        for line in fr:
+            line = line.rstrip("\n").split("\t")
+            try:
+                peaks.append((str(line[0]), float(line[1]), float(line[2])))
+            except (ValueError, IndexError):
+                log(settings, 2, "Ignoring line: " + str(line) + " from file: " + str(fileName))
+    return peaks
+
+
+def batchFiles(batchFolder, fileTypes):
+    """ Return the sorted list of files in batchFolder matching any of fileTypes """
+    filesGrabbed = []
+    for files in fileTypes:
+        for file in glob.glob(os.path.join(batchFolder, files)):
+            if os.path.basename(file) not in EXCLUSION_FILES and file not in filesGrabbed:
+                filesGrabbed.append(file)
+    return sorted(filesGrabbed)
+
+
+def backgroundNoise(intensity, low, high, settings, profile=None):
+    """Return the background and noise of intensity[low:high].
+
+    The method is defined in the settings. When a profile is given, the
+    rolling profile of the MT method is shared with all other windows of
+    the same chromatogram (see util.BackgroundProfile).
+    """
+    if profile is None:
+        profile = util.BackgroundProfile()
+    return profile.get(intensity, low, high, settings.backgroundNoiseMethod, settings.noise, settings.slicepoints,
+                       settings.nobanStart)
+
+
+def determineTimepairs(refPeaks, trace, settings, profile=None):
+    """Return the (expected, observed) retention times of the calibrants.
+
+    The observed time is the time of the highest intensity within the
+    window of a calibrant, calibrants that do not reach the minimum S/N
+    (defined in settings.minPeakSN) are ignored.
+    """
+    time, intensity = trace.x, trace.y
+    timePairs = []
+    for i in refPeaks:
+        low = bisect.bisect_left(time, i[1] - i[2])
+        high = bisect.bisect_right(time, i[1] + i[2])
+        lowBackground = bisect.bisect_left(time, max(i[1] - settings.backgroundWindow, settings.start))
+        highBackground = bisect.bisect_right(time, min(i[1] + settings.backgroundWindow, settings.end))
+        NOBAN = backgroundNoise(intensity, lowBackground, highBackground, settings, profile)
+        max_index = int(np.argmax(intensity[low:high]))
+        max_value = intensity[low + max_index]
+        if ((max_value - NOBAN['Background']) / NOBAN['Noise']) >= settings.minPeakSN:
+            timePairs.append((i[1], time[low + max_index]))
+    return timePairs
+
+
+def performCalibration(timePairs, trace, settings, warmStart=None):
+    """Calibrate the trace using the calibrant time pairs.
+
+    Returns a dict with the calibrated Trace ('Data'), the calibration
+    function ('Function') and the model selection of
+    calibration.select_model ('Calibration'), all are None if not enough
+    calibrants passed the minimum S/N. When a calibration.WarmStart is
+    given, the model of the previously calibrated trace is reused if it
+    still fits. The calibration is applied to the time axis as an array
+    (calibration.apply).
+    """
+    if len(timePairs) < settings.minPeaks:
+        log(settings, 1, "File not calibrated due to lack of features, " + str(len(timePairs)) +
+            " passed the minimum S/N (" + str(settings.minPeakSN) + ") while " + str(settings.minPeaks) +
+            " were needed")
+        return {"Data": None, "Function": None, "Calibration": None}
+    expectedTime, observedTime = list(zip(*timePairs))
+    if warmStart is not None:
+        selected = warmStart.select(observedTime, expectedTime, trace.x[0], trace.x[-1], settings.min_improvement,
+                                    settings.use_interpolation)
+    else:
+        selected = calibration.select_model(observedTime, expectedTime, trace.x[0], trace.x[-1],
+                                            settings.min_improvement, settings.use_interpolation)
+    f = selected['Function']
+    return {"Data": Trace.from_xy(calibration.apply(f, trace.x), trace.y), "Function": f,
+            "Calibration": selected}
+
+
+def batchCalibrationControl(trace, calFile, settings, profile=None, warmStart=None):
+    """ Calibrate a trace using the calibrants in calFile """
+    # Get calibration values
+    refPeaks = get_peak_list(calFile, settings)
+
+    # Get observed times
+    timePairs = determineTimepairs(refPeaks, trace, settings, profile)
+
+    # Calibrate
+    return performCalibration(timePairs, trace, settings, warmStart)
+
+
+def calibrateFile(file, calFile, batchFolder, settings, export=None, profile=None, warmStart=None):
+    """Calibrate a single file.
+
+    Returns a dict with the calibrated Trace ('Data'), the calibration
+    function ('Function'), its model selection ('Calibration') and the
+    name of the calibrated chromatogram ('Name'), or None if the file
+    could not be calibrated. The calibration formula is always written to
+    disk (.cal), the calibrated chromatogram itself only if export
+    (default settings.writeCalibrated) is set.
+    """
+    log(settings, 1, "Calibrating file: " + str(file))
+    trace = Trace.from_file(file, use_cache=settings.traceCache).correct_baseline(settings.points,
+                                                                                   settings.baselineOrder)
+    data = batchCalibrationControl(trace, calFile, settings, profile, warmStart)
+    if data['Data'] is None:
+        return None
+    data['Name'] = os.path.join(batchFolder, "calibrated_" + os.path.basename(file))
+    writeCalibration(data)
+    if export or (export is None and settings.writeCalibrated):
+        data['Data'].write_txt(data['Name'], settings.decimalNumbers)
+    return data
+
+
+def processFile(file, calFile, analFile, batchFolder, settings, warmStart=None):
+    """Calibrate and (optionally) quantify a single file.
+
+    This function is executed by the batch worker processes. The
+    calibrated chromatogram is handed to the quantitation in memory, it
+    is only written to disk when settings.writeCalibrated is set or when
+    there is no analyte file (i.e. calibration is the only output). The
+    rolling background and noise profile of the chromatogram is shared by
+    the calibrant and analyte windows of both stages (util.BackgroundProfile).
+    The calibration.WarmStart (if any) is shared by the consecutive files
+    of a block (see processBlock).
+    Returns a dict with the name of the calibrated chromatogram ('Name'),
+    its calibration model ('Model') and formula ('Calibration'), if the
+    model of the previous file was reused ('FastPath') and the
+    quantitation results ('Results', None without an analyte file), or
+    None if the file could not be calibrated.
+    """
+    profile = util.BackgroundProfile()
+    data = calibrateFile(file, calFile, batchFolder, settings, export=settings.writeCalibrated or not analFile,
+                         profile=profile, warmStart=warmStart)
+    results = None
+    if data is not None and analFile:
+        log(settings, 1, "Quantifying file: " + str(data['Name']))
+        results = batchQuantitationControl(data, analFile, batchFolder, settings, profile)
+    log(settings, 2, "Background profile of file: " + str(file) + ": " + repr(profile))
+    if data is None:
+        return None
+    log(settings, 2, "Calibration model of file: " + str(file) + ": " + str(data['Calibration']['Model']) +
+        (" (reused)" if data['Calibration'].get('FastPath') else ""))
+    return {'Name': data['Name'], 'Model': data['Calibration']['Model'],
+            'Calibration': calibration.describe(data['Function']),
+            'FastPath': data['Calibration'].get('FastPath', False), 'Results': results}
+
+
+def processBlock(files, calFile, analFile, batchFolder, settings):
+    """Calibrate and (optionally) quantify a block of consecutive files with a shared warm start.
+
+    This function is executed by the batch worker processes. Every block
+    starts with a new calibration.WarmStart, so which files reuse the
+    model of the previous file only depends on the order of the files.
+    Returns the result of processFile for every file, or a BatchFailure
+    for a file that failed.
+    """
+    warmStart = calibration.WarmStart()
+    return [parallel.call(functools.partial(processFile, calFile=calFile, analFile=analFile,
+                                            batchFolder=batchFolder, settings=settings, warmStart=warmStart), file)
+            for file in files]
+
+
+def quantifyFile(file, analFile, batchFolder, settings):
+    """Quantify a single (previously calibrated) file, executed by the batch worker processes.
+
+    Returns a dict with the name of the file ('Name'), the calibration
+    formula from its .cal file ('Calibration', empty if there is none)
+    and the quantitation results ('Results').
+    """
+    log(settings, 1, "Quantifying file: " + str(file))
+    data = {'Data': Trace.from_file_txt(file), 'Name': file}
+    profile = util.BackgroundProfile()
+    results = batchQuantitationControl(data, analFile, batchFolder, settings, profile)
+    log(settings, 2, "Background profile of file: " + str(file) + ": " + repr(profile))
+    formula = ""
+    calFile = os.path.join(batchFolder, os.path.splitext(os.path.basename(file))[0] + ".cal")
+    if os.path.isfile(calFile):
+        with open(calFile) as fr:
+            formula = fr.readline()
+    return {'Name': file, 'Calibration': formula, 'Results': results}
+
+
+def batchQuantitationControl(data, analFile, batchFolder, settings, profile=None):
+    """Quantify the current chromatogram and return the results.
+
+    This function will open the analyte file (analFile), read all lines
+    and split the line on tabs. The individual segments (name, time and
+    time window) are then appended as a tuple to the list peaks.
+    Next, the function will iterate over all tuples in the list peaks
+    and isolate the relevant segment of the chromatogram using a binary
+    search. The local background and noise is then determined using
+    either the NOBAN or MT method, prior to integrating the peak and
+    background areas. The best fitting Gaussian (for the highest
+    intensity datapoints) is determined and used to calculate the
+    overlap between the Gaussian and observed pattern. Optionally, the
+    data of the figures showing the raw data, fitted Gaussian peak,
+    background, noise and the overlap percentage is saved to the disk as
+    a plot payload, the figures themselves are rendered afterwards (see
+    renderReports). Lastly, the function returns the results of all
+    analytes as a quantitation.RESULT_TYPE array (in the order of the
+    analyte file).
+
+    Keyword arguments:
+    data -- dict with the Trace ('Data') and file name ('Name')
+    analFile -- unicode string
+    batchFolder -- unicode string
+    settings -- BatchSettings
+    profile -- util.BackgroundProfile of the chromatogram (shared with the calibration)
+    """
+    peaks = get_peak_list(analFile, settings)
+    time, intensity = np.asarray(data['Data'].x), np.asarray(data['Data'].y)
+    name = os.path.splitext(os.path.basename(data['Name']))[0]
+
+    # Plot chromatogram region of interest (check if X[0] and X[-1] can be found before start)
+    figures = None
+    if settings.createFigure and bisect.bisect_left(time, settings.start) and bisect.bisect_right(time,
+                                                                                                  settings.end):
+        import report
+        figures = {'Name': name, 'Version': version, 'Report': report.reportName(batchFolder, data['Name']),
+                   'Overview': report.overviewPayload(peaks, name, time, intensity, settings.start, settings.end),
+                   'Details': []}
+
+    # Get the time boundaries, signal-to-noise and areas of all analytes
+    quantities = quantitation.windows(time, [i[1] for i in peaks], [i[2] for i in peaks], settings.backgroundWindow,
+                                      settings.start, settings.end)
+    backgrounds = []
+    for row in quantities:
+        NOBAN = backgroundNoise(intensity, int(row['lowBackground']), int(row['highBackground']), settings, profile)
+        row['background'], row['noise'] = NOBAN['Background'], NOBAN['Noise']
+        backgrounds.append(NOBAN)
+    quantitation.integrate(time, intensity, quantities)
+    steps = quantitation.time_steps(time)
+
+    for i, row, NOBAN in zip(peaks, quantities, backgrounds):
+        # Initialize values
+        gaussArea = 0
+        height = 0
+        residual = "NAN"
+        fwhm = {'fwhm': 0, 'width': 0, 'center': 0}
+        low, high = int(row['low']), int(row['high'])
+
+        # Resample the spline according to the analyte window and get the
+        # breakpoints (where f'(x) == 0 on that grid) from the spline itself
+        x_data = time[low:high]
+        y_data = intensity[low:high]
+        f = InterpolatedUnivariateSpline(x_data, y_data)
+        newX = util.resample(x_data, peak_width=i[2], points_per_width=WINDOW_POINTS)
+        newY = f(newX)
+        breaks = util.grid_extrema(f, newX).tolist()
+
+        # Initialize maxPoint, xData and yData
+        maxPoint = 0
+        xData = newX
+        yData = newY - NOBAN['Background']
+
+        # Subset the data
+        # Region from newY[0] to breaks[0]
+        try:
+            if max(newY[0:breaks[0]]) > maxPoint:
+                maxPoint = max(newY[0:breaks[0]])
+                xData = newX[0:breaks[0]]
+                yData = newY[0:breaks[0]] - NOBAN['Background']
+        except (IndexError, ValueError):
+            pass
+        # Regions between breaks[x] and breaks[x+1]
+        for index in range(len(breaks) - 1):
+            if max(newY[breaks[index]:breaks[index + 1]]) > maxPoint:
+                maxPoint = max(newY[breaks[index]:breaks[index + 1]])
+                xData = newX[breaks[index]:breaks[index + 1]]
+                yData = newY[breaks[index]:breaks[index + 1]] - max(NOBAN['Background'], 0)
+        # Region from break[-1] to newY[-1]
+        try:
+            if max(newY[breaks[-1]:-1]) > maxPoint:
+                maxPoint = max(newY[breaks[-1]:-1])
+                xData = newX[breaks[-1]:-1]
+                yData = newY[breaks[-1]:-1] - NOBAN['Background']
+        except (IndexError, ValueError):
+            pass
+
+        # Gaussian fit on main points
+        newGaussX = newX
+        newGaussY = np.zeros(len(newGaussX))
+        try:
+            coeff = util.fit_gaussian(xData, yData, maxfev=settings.fitMaxfev, timeout=settings.fitTimeout)
+            newGaussY = util.gauss_function(newGaussX, *coeff) + NOBAN['Background']
+            gaussArea = np.sum(np.maximum(util.gauss_function(x_data, *coeff), 0) * steps[low:high])
+            fwhm = {'fwhm': util.fwhm(coeff), 'width': util.hwhm(coeff), 'center': util.peak_centre(coeff)}
+            height = util.gauss_function(fwhm['center'] + fwhm['width'], *coeff) + NOBAN['Background']
+            row['gaussArea'], row['fwhm'], row['actualTime'] = gaussArea, fwhm['fwhm'], fwhm['center']
+        except TypeError:
+            log(settings, 2, "Not enough data points to fit a Gaussian to peak: " + str(i[0]))
+        except util.FitTimeout:
+            log(settings, 2, "Gaussian fit exceeded its time budget for peak: " + str(i[1]))
+        except RuntimeError:
+            log(settings, 2, "Unable to determine residuals for peak: " + str(i[1]))
+
+        # Determine Residual
+        if gaussArea != 0 and row['totalArea'] != 0:
+            residual = min(gaussArea / row['totalArea'], 1.0)
+            row['residual'] = residual
+
+        # Keep the data of the plot
+        if figures is not None and residual != "NAN":
+            log(settings, 2, "Keeping figure data for analyte: " + str(i[0]))
+            details = {'fwhm': fwhm, 'height': height, 'NOBAN': NOBAN, 'newData': (newX, newY),
+                       'newGauss': (newGaussX, newGaussY),
+                       'data': (time, intensity), 'low': low, 'high': high, 'residual': residual, 'i': i}
+            figures['Details'].append(report.detailPayload(details))
+
+    if figures is not None:
+        report.savePayload(report.payloadName(batchFolder, data['Name']), figures)
+
+    return quantities
+
+
+def renderReports(batchFolder, settings, progress=None):
+    """Render the PDF reports of all plot payloads in the batch folder.
+
+    The payloads (written by batchQuantitationControl) are rendered by a
+    pool of worker processes (settings.processes), every payload is
+    removed once its report is written. The detail renderer of this
+    process (see report.detailRenderer) is discarded afterwards. Returns the BatchFailure entries
+    of the payloads that could not be rendered.
+
+    Keyword arguments:
+    batchFolder -- unicode string
+    settings -- BatchSettings
+    progress -- optional callable receiving (done, total)
+    """
+    import report
+    payloads = sorted(glob.glob(os.path.join(batchFolder, "*" + report.PAYLOAD_EXTENSION)))
+    log(settings, 1, "Rendering " + str(len(payloads)) + " reports")
+    results = parallel.map_files(functools.partial(report.renderPayload, remove=True), payloads,
+                                 processes=settings.processes, callback=progress)
+    # The reports may have been rendered in this process, its renderer is not kept after the batch
+    report.resetDetailRenderer()
+    failures = parallel.failures(results)
+    for failure in failures:
+        log(settings, 1, "Unable to render report of: " + str(failure.item) + " (" + failure.error + ")")
+    return failures
+
+
+def combineResults(batchFolder, settings, store=None):
+    """Combine the results of all quantified files into a summary file.
+
+    Every section of the summary is a column of the util.ResultStore of
+    the batch (or a vectorized combination of columns). Unless a store is
+    given, it is memory mapped from RESULTS_FILE in the batch folder. The
+    sections are streamed one at a time, in chunks of SUMMARY_CHUNK
+    samples that are formatted and written at once, so the memory use
+    does not depend on the number of samples.
+
+    Returns the name of the summary file.
+    """
+    if store is None:
+        store = util.ResultStore.load(os.path.join(batchFolder, RESULTS_FILE), mmap=True)
+
+    # Construct the filename for the output
+    utc_datetime = datetime.utcnow()
+    s = utc_datetime.strftime("%Y-%m-%d-%H%MZ")
+    filename = os.path.join(batchFolder, s + "_" + settings.output)
+
+    # Construct header
+    header = ""
+    if len(store):
+        header = "".join("\t" + i for i in store.analytes.tolist()) + "\n"
+        header += "".join("\t" + str(i) for i in store['time'][0].tolist()) + "\n"
+
+    # The enabled sections with their (samples, analytes) values of a chunk of samples
+    sections = [
+        (settings.absInt and not settings.bckSub, "Peak Area", lambda chunk: chunk['area']),
+        (settings.absInt and settings.bckSub, "Peak Area (Background Subtracted)",
+         util.ResultStore.background_subtracted_area),
+        (settings.relInt and not settings.bckSub, "Relative Peak Area (TAN)",
+         lambda chunk: chunk.relative_area(False)),
+        (settings.relInt and settings.bckSub, "Relative Peak Area (TAN, Background Subtracted)",
+         util.ResultStore.relative_area),
+        (settings.bckNoise, "Peak Noise (standard deviation of integration window)", lambda chunk: chunk['peakNoise']),
+        (settings.bckNoise, "Background", lambda chunk: chunk['background']),
+        (settings.bckNoise, "Noise", lambda chunk: chunk['noise']),
+        (settings.peakQual, "Signal-to-Noise", lambda chunk: chunk['signalNoise']),
+        (settings.peakQual, "GPQ (Gaussian Peak Quality)", lambda chunk: chunk['residual']),
+        (settings.peakQual, "FWHM", util.ResultStore.fwhm),
+        (settings.peakQual, "Retention Time Residual", util.ResultStore.time_residual),
+        (settings.peakQual, "Retention Time", util.ResultStore.peak_time),
+    ]
+
+    # Write results, settings and version information
+    with open(filename, 'w') as fw:
+        # Metadata
+        fw.write("PyChromat Settings\n")
+        fw.write("Version:\t" + str(version) + "\n")
+        fw.write("Start Time:\t" + str(settings.start) + "\n")
+        fw.write("End Time:\t" + str(settings.end) + "\n")
+        fw.write("Baseline Order:\t" + str(settings.baselineOrder) + "\n")
+        fw.write("Background Window:\t" + str(settings.backgroundWindow) + "\n")
+        fw.write("Background and noise method:\t" + str(settings.backgroundNoiseMethod) + "\n")
+        if settings.backgroundNoiseMethod == "MT":
+            fw.write("MT Slice Points:\t" + str(settings.slicepoints) + "\n")
+        elif settings.backgroundNoiseMethod == "NOBAN":
+            fw.write("NOBAN Initial Estimate:\t" + str(settings.nobanStart) + "\n")
+        fw.write("Noise:\t" + str(settings.noise) + "\n")
+        fw.write("\n")
+
+        for enabled, title, values in sections:
+            if not enabled:
+                continue
+            fw.write(title)
+            fw.write(header)
+            for chunk in store.chunks(SUMMARY_CHUNK):
+                names = chunk.samples.tolist()
+                if title == "Retention Time Residual":
+                    names = [name + (" [" + formula + "]" if formula else "")
+                             for name, formula in zip(names, chunk.calibrations.tolist())]
+                fw.write("".join("\t".join([name] + list(map(str, row))) + "\n"
+                                 for name, row in zip(names, values(chunk).tolist())))
+            fw.write("\n")
+    return filename
+
+
+def writeCalibration(data):
+    """ Write the calibration formula of a calibrated chromatogram to disk (.cal) """
+    with open(os.path.splitext(data['Name'])[0] + '.cal', 'w') as fw:
+        fw.write(calibration.describe(data['Function']))
+
+
+def run(batch_folder, calibration_file=None, analyte_file=None, settings=None, progress=None):
+    """Calibrate and quantify all files in a folder and write the summary.
+
+    The calibration and quantitation of the individual files are spread
+    over a pool of worker processes (settings.processes). The files are
+    processed in a deterministic order and a file that fails is logged
+    and skipped, without stopping the remainder of the batch. When both
+    a calibration and an analyte file are given, every file is
+    calibrated and quantified in one go without writing the calibrated
+    chromatogram to disk (unless settings.writeCalibrated is set). With
+    only an analyte file, the previously calibrated chromatograms
+    (INTEGRATION_FILETYPES) in the folder are quantified.
+
+    When settings.warmStart is set, the calibration model of a file is
+    reused for the next file if it still fits (see calibration.WarmStart).
+    The files are then split into blocks of WARM_START_BLOCK consecutive
+    files (see processBlock), so the files that reuse a model, and thus
+    the results, do not depend on the number of processes.
+
+    The results of every quantified file are written to the
+    util.ResultStore in RESULTS_FILE in the batch folder as soon as its
+    worker returns (see util.ResultWriter), so the results of the batch
+    are never all held in memory, and the summary is written from that
+    store. When settings.database is set,
+    the results are also added to that util.ResultsDatabase.
+
+    When settings.createFigure is set, the quantitation only stores the
+    data of the figures; the PDF reports are rendered in a separate
+    parallel stage once all results are written (see renderReports),
+    unless settings.deferFigures is set. A later run with createFigure
+    set renders the reports of the payloads that are still in the folder.
+
+    Returns a dict with the summary file name ('Summary', None if no
+    analyte file was given), the util.ResultStore ('Results', None if no
+    analyte file was given), the BatchFailure entries of both stages and
+    the number of calibrated files that reused the model of the previous
+    file ('FastPath') out of all calibrated files ('Calibrated').
+
+    Keyword arguments:
+    batch_folder -- folder containing the raw chromatograms
+    calibration_file -- calibrant reference file, None to skip calibration
+    analyte_file -- analyte reference file, None to skip quantitation
+    settings -- BatchSettings, None for the defaults
+    progress -- optional callable receiving (stage, done, total)
+    """
+    if settings is None:
+        settings = BatchSettings()
+    start = datetime.now()
+    summary = None
+    store = None
+    failures = []
+    calibrated = 0
+    fastPath = 0
+    filesGrabbed = []
+    outcomes = []
+
+    # Calibration (and quantitation of the calibrated data in memory)
+    if calibration_file:
+        filesGrabbed = [file for file in batchFiles(batch_folder, CALIBRATION_FILETYPES)
+                        if not os.path.basename(file).startswith("calibrated")]
+        callback = _progress_callback(progress, "Processing" if analyte_file else "Calibration")
+        if settings.warmStart:
+            blocks = [filesGrabbed[i:i + WARM_START_BLOCK] for i in range(0, len(filesGrabbed), WARM_START_BLOCK)]
+            blockCallback = None
+            if callback is not None:
+                def blockCallback(done, total):
+                    callback(min(done * WARM_START_BLOCK, len(filesGrabbed)), len(filesGrabbed))
+            blocks = parallel.imap_files(functools.partial(processBlock, calFile=calibration_file,
+                                                           analFile=analyte_file, batchFolder=batch_folder,
+                                                           settings=settings),
+                                         blocks, processes=settings.processes, callback=blockCallback)
+            outcomes = (result for block in blocks for result in (block if isinstance(block, list) else [block]))
+        else:
+            outcomes = parallel.imap_files(functools.partial(processFile, calFile=calibration_file,
+                                                             analFile=analyte_file, batchFolder=batch_folder,
+                                                             settings=settings),
+                                           filesGrabbed, processes=settings.processes, callback=callback)
+        ignored = "Ignoring file: %s (%s)"
+
+    # Quantitation of previously calibrated data
+    elif analyte_file:
+        filesGrabbed = batchFiles(batch_folder, INTEGRATION_FILETYPES)
+        outcomes = parallel.imap_files(functools.partial(quantifyFile, analFile=analyte_file,
+                                                         batchFolder=batch_folder, settings=settings),
+                                       filesGrabbed, processes=settings.processes,
+                                       callback=_progress_callback(progress, "Integration"))
+        ignored = "Ignoring file: %s for quantitation (%s)"
+
+    # The results are written to the store as the workers return them
+    writer = None
+    if analyte_file:
+        writer = util.ResultWriter(os.path.join(batch_folder, RESULTS_FILE),
+                                   [i[0] for i in get_peak_list(analyte_file, settings)], len(filesGrabbed))
+    try:
+        for result in outcomes:
+            if isinstance(result, parallel.BatchFailure):
+                log(settings, 1, ignored % (result.item, result.error))
+                failures.append(result)
+                continue
+            if calibration_file:
+                calibrated += 1
+                fastPath += result['FastPath']
+            if result['Results'] is not None:
+                writer.add(os.path.splitext(os.path.basename(result['Name']))[0], result['Calibration'],
+                           result['Results'])
+        if calibration_file and settings.warmStart:
+            log(settings, 1, "Calibration model reused for " + str(fastPath) + " of " + str(calibrated) + " files")
+
+        if analyte_file:
+            log(settings, 1, "Creating summary file")
+            store = writer.close()
+            summary = combineResults(batch_folder, settings, store)
+            if settings.database:
+                log(settings, 1, "Adding results to database: " + str(settings.database))
+                with util.ResultsDatabase(settings.database) as database:
+                    database.add_batch(store, settings, batch_folder, start, version)
+    finally:
+        # Remove the temporary file of the writer when the batch is interrupted before the store is written
+        if writer is not None:
+            writer.discard()
+
+    # Reports, rendered after all numeric results are available
+    if settings.createFigure and not settings.deferFigures:
+        failures.extend(renderReports(batch_folder, settings, progress=_progress_callback(progress, "Reports")))
+
+    log(settings, 1, "Batch Process finished and took a total time of " + str(datetime.now() - start))
+    return {'Summary': summary, 'Results': store, 'Failures': failures, 'Calibrated': calibrated,
+            'FastPath': fastPath}
+
+
+def _progress_callback(progress, stage):
+    if progress is None:
+        return None
+    return lambda done, total: progress(stage, done, total)
+
+
+def main(argv=None):
+    """ Command line interface of the batch process """
+    parser = argparse.ArgumentParser(prog="pychromat batch",
+                                     description="Calibrate and quantify all chromatograms in a folder.")
+    parser.add_argument("folder", help="folder containing the chromatograms")
+    parser.add_argument("-c", "--calibration", help="calibrant reference file")
+    parser.add_argument("-a", "--analytes", help="analyte reference file")
+    parser.add_argument("-s", "--settings", help="settings file (PyChromat.ini format)")
+    parser.add_argument("-p", "--processes", type=int, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--figures", action="store_true", help="create a PDF report per chromatogram")
+    parser.add_argument("--defer-figures", action="store_true",
+                        help="only store the data of the figures, render the reports in a later run with --figures")
+    parser.add_argument("--write-calibrated", action="store_true", help="write the calibrated chromatograms to disk")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="reuse the calibration model of the previous file when it still fits")
+    parser.add_argument("--cache", action="store_true",
+                        help="keep the parsed chromatograms in the on-disk cache (PYCHROMAT_CACHE_DIR)")
+    parser.add_argument("--log", help="append log messages to this file")
+    parser.add_argument("--database", help="add the results to this SQLite database")
+    args = parser.parse_args(argv)
+
+    settings = BatchSettings.from_file(args.settings) if args.settings else BatchSettings()
+    if args.processes is not None:
+        settings.processes = args.processes
+    if args.figures:
+        settings.createFigure = True
+    if args.defer_figures:
+        settings.createFigure = True
+        settings.deferFigures = True
+    if args.write_calibrated:
+        settings.writeCalibrated = True
+    if args.warm_start:
+        settings.warmStart = True
+    if args.cache:
+        settings.traceCache = True
+    if args.log:
+        settings.logFile = args.log
+    if args.database:
+        settings.database = args.database
+
+    result = run(args.folder, args.calibration, args.analytes, settings)
+    for failure in result['Failures']:
+        print("Failed: " + str(failure.item) + " (" + failure.error + ")", file=sys.stderr)
+    if result['Summary']:
+        print(result['Summary'])
+    return 1 if result['Failures'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
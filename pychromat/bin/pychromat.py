@@ -1,11 +1,25 @@
 #! /usr/bin/env python
 
-from pychromat.gui import *
+import os
+import sys
 
+# The modules of the package import each other as top-level modules (e.g. 'import util'), so the package
+# directory goes on sys.path. This also keeps this script from hiding the package of the same name.
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def main():
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if PACKAGE_DIR not in sys.path:
+        sys.path.insert(0, PACKAGE_DIR)
+    if argv and argv[0] == "batch":
+        import batch
+        return batch.main(argv[1:])
+
+    from gui import PyChromatGui
     PyChromatGui.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -1,4 +1,5 @@
-
+import util
+from util import calibration
 
 
 def determineCalibrants(functions):
@@ -85,67 +86,13 @@ def noban(data):
     outside of the current average plus three times the standard
     definition (as any point that is > 3SD is considered a signal).
     Alternatively, the function can also shrink the initial region if it
-    appears that the initial estimate was too greedy. A major difference
-    between the original implementation and this implementation is that
-    this function should converge faster by allowing to take different
-    step sizes.
+    appears that the initial estimate was too greedy. The work is done by
+    util.noban, which uses prefix sums and binary searches.
 
     Keyword arguments:
     data -- list of numbers
     """
-
-    def calc_values(sorted_data, curr_size, curr_average, curr_noise, increment):
-        curr_size += increment
-        curr_average = np.average(sorted_data[0:curr_size])
-        if noise == "MM":
-            curr_noise = max(sorted_data[0:curr_size]) - min(sorted_data[0:curr_size])
-        elif noise == "RMS":
-            curr_noise = np.std(sorted_data[0:curr_size])
-        return curr_size, curr_average, curr_noise
-
-    sorted_data = sorted(data)
-    start_size = int(nobanStart * float(len(sorted_data)))
-    curr_size = start_size
-    curr_average = np.average(sorted_data[0:curr_size])
-    if noise == "MM":
-        curr_noise = max(sorted_data[0:curr_size]) - min(sorted_data[0:curr_size])
-    elif noise == "RMS":
-        curr_noise = np.std(sorted_data[0:curr_size])
-    direction_flag = 0
-    # <<NOBAN-V2>>
-    # This algorithm now includes faster convergence (by starting with a large step
-    # and taking smaller steps the closer we get to the minimum).
-    for k in range(0, len(sorted_data) - (start_size + 1)):
-        remainder = len(sorted_data) - curr_size
-        try:
-            if sorted_data[curr_size + int(math.ceil(0.1 * remainder))] < curr_average + 3 * curr_noise:
-                direction_flag == 1
-                curr_size, curr_average, curr_noise = calc_values(sorted_data, curr_size, curr_average, curr_noise,
-                                                                  int(math.ceil(0.1 * remainder)))
-            elif sorted_data[curr_size + int(math.ceil(0.05 * remainder))] < curr_average + 3 * curr_noise:
-                direction_flag == 1
-                curr_size, curr_average, curr_noise = calc_values(sorted_data, curr_size, curr_average, curr_noise,
-                                                                  int(math.ceil(0.05 * remainder)))
-            elif sorted_data[curr_size + 1] < curr_average + 3 * curr_noise:
-                direction_flag == 1
-                curr_size, curr_average, curr_noise = calc_values(sorted_data, curr_size, curr_average, curr_noise, 1)
-            elif sorted_data[
-                curr_size - int(math.ceil(0.1 * remainder))] > curr_average + 3 * curr_noise and direction_flag == 0:
-                curr_size, curr_average, curr_noise = calc_values(sorted_data, curr_size, curr_average, curr_noise,
-                                                                  -int(math.ceil(0.1 * remainder)))
-            elif sorted_data[
-                curr_size - int(math.ceil(0.05 * remainder))] > curr_average + 3 * curr_noise and direction_flag == 0:
-                curr_size, curr_average, curr_noise = calc_values(sorted_data, curr_size, curr_average, curr_noise,
-                                                                  -int(math.ceil(0.05 * remainder)))
-            elif sorted_data[curr_size - 1] > curr_average + 3 * curr_noise and direction_flag == 0:
-                curr_size, curr_average, curr_noise = calc_values(sorted_data, curr_size, curr_average, curr_noise, -1)
-            else:
-                break
-        except IndexError:
-            break
-    if curr_noise == 0:
-        curr_noise = 1
-    return {'Background': curr_average, 'Noise': curr_noise}
+    return util.noban(data, nobanStart, noise)
 
 
 def quantifyChrom(fig, canvas):
@@ -181,9 +128,8 @@ def quantifyChrom(fig, canvas):
         x_data = np.array(time[low:high])
         y_data = np.array(intensity[low:high])
         newX = np.linspace(x_data[0], x_data[-1], 2500 * (x_data[-1] - x_data[0]))
-        p0 = [np.max(y_data), x_data[np.argmax(y_data)], 0.1]
         try:
-            coeff, var_matrix = scipy.optimize.curve_fit(gauss_function, x_data, y_data, p0)
+            coeff = util.fit_gaussian(x_data, y_data)
             newY = gauss_function(newX, *coeff)
             # Get residuals
             for index, j in enumerate(time[low:high]):
@@ -255,71 +201,7 @@ def ultraPerformanceCalibration(measured, expected, minimum, maximum):
     INPUT2: List of expected data points
     OUTPUT: Function object
     """
-    RMS = sys.maxsize
-    func = None
-
-    # Polynomials between 1 and len(expected)
-    for i in range(1, len(expected)):
-        z = np.polyfit(measured, expected, i)
-        f = np.poly1d(z)
-
-        # Check if the fitted polynomial is monotone
-        X_range = np.linspace(minimum, maximum, 10000)
-        dx = np.diff(f(X_range))
-        if not np.all(dx > 0):
-            break
-
-        # Calculate RMS
-        RMS_buffer = []
-        for index, j in enumerate(measured):
-            RMS_buffer.append((f(j) - expected[index]) ** 2)
-        RMS_buffer = np.mean(RMS_buffer)
-        RMS_buffer = math.sqrt(RMS_buffer)
-        if RMS_buffer < RMS - min_improvement * RMS:
-            RMS = RMS_buffer
-            func = f
-
-    # Power Law
-    z = scipy.optimize.curve_fit(powerLaw, measured, expected)
-
-    # Check if the fitted power law function is monotone
-    X_range = np.linspace(minimum, maximum, 10000)
-    dx = np.diff(powerLaw(X_range, *z[0]))
-    if np.all(dx > 0):
-        # Calculate RMS
-        RMS_buffer = []
-        for index, i in enumerate(measured):
-            RMS_buffer.append((powerLaw(i, *z[0]) - expected[index]) ** 2)
-        RMS_buffer = np.mean(RMS_buffer)
-        RMS_buffer = math.sqrt(RMS_buffer)
-        if RMS_buffer < RMS - min_improvement * RMS:
-            RMS = RMS_buffer
-            func = util.PowerLawCall(*z[0])
-
-    if use_interpolation:
-        # Monotonic Piecewise Cubic Hermite Interpolating Polynomial
-        RMS_buffer = []
-        f = scipy.interpolate.PchipInterpolator(measured, expected)
-        for index, j in enumerate(measured):
-            RMS_buffer.append((f(j) - expected[index]) ** 2)
-        RMS_buffer = np.mean(RMS_buffer)
-        RMS_buffer = math.sqrt(RMS_buffer)
-        if RMS_buffer < RMS - min_improvement * RMS:
-            RMS = RMS_buffer
-            func = f
-
-        # Akima 1D Interpolator
-        RMS_buffer = []
-        f = scipy.interpolate.Akima1DInterpolator(measured, expected)
-        for index, j in enumerate(measured):
-            RMS_buffer.append((f(j) - expected[index]) ** 2)
-        RMS_buffer = np.mean(RMS_buffer)
-        RMS_buffer = math.sqrt(RMS_buffer)
-        if RMS_buffer < RMS - min_improvement * RMS:
-            RMS = RMS_buffer
-            func = f
-
-    return func
+    return calibration.ultraPerformanceCalibration(measured, expected, minimum, maximum)
 
 
 def writeData(data, file_path):
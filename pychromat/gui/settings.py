@@ -15,9 +15,13 @@ minPeaks = 4
 decimalNumbers = 6
 min_improvement = 0.05
 use_interpolation = False
+warmStart = False
+# Keep parsed chromatograms in the on-disk cache (util.cache, under PYCHROMAT_CACHE_DIR or ~/.cache/pychromat)
+traceCache = False
 noise = "RMS"
 backgroundNoiseMethod = "MT"
 output = "summary.results"
+processes = None
 
 
 def get_settings():
@@ -65,4 +69,9 @@ def get_settings():
                 peakDetectionEdge = str(chunks[1])
             elif chunks[0] == "peakDetectionEdgeValue:":
                 peakDetectionEdgeValue = float(chunks[1])
-
+            elif chunks[0] == "processes:":
+                global processes
+                processes = int(chunks[1]) or None
+            elif chunks[0] == "traceCache:":
+                global traceCache
+                traceCache = chunks[1].strip().lower() in ("true", "1", "yes")
@@ -0,0 +1,244 @@
+import bisect
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+from scipy.interpolate import InterpolatedUnivariateSpline
+
+# This module deliberately uses the object oriented matplotlib interface
+# (and never pyplot) so that reports can be created on headless machines
+# and in worker processes, without any global pyplot state.
+
+# File extension of plot payloads and the arrays of a detail page that are stored in a payload
+PAYLOAD_EXTENSION = ".figures.npz"
+DETAIL_ARRAYS = ('newX', 'newY', 'newGaussX', 'newGaussY', 'time', 'intensity')
+
+
+def openReport(filename, name, version):
+    """ Open a PdfPages report and fill in its metadata """
+    pdf = PdfPages(filename)
+    d = pdf.infodict()
+    d['Title'] = 'PDF Report for: ' + str(name)
+    d['Author'] = 'PyChromat version: ' + str(version)
+    d['CreationDate'] = datetime.now()
+    return pdf
+
+
+def plotOverview(pdf, peaks, name, time, intensity, start, end):
+    """Add an overview page of the chromatogram to the report.
+
+    The overview shows the chromatogram between start and end, with the
+    quantitation window of every analyte shaded and labeled.
+    """
+    low = bisect.bisect_left(time, start)
+    high = bisect.bisect_right(time, end)
+    fig = Figure(figsize=(8, 6))
+    ax = fig.add_subplot(111)
+    ax.plot(time[low:high], intensity[low:high], 'b-')
+    ax.legend(['Raw Data'], loc='best')
+    ax.set_title(str(name))
+    ax.set_xlabel("Retention Time [m]")
+    ax.set_ylabel("Intensity [au]")
+    for i in peaks:
+        low = bisect.bisect_left(time, i[1] - i[2])
+        high = bisect.bisect_right(time, i[1] + i[2])
+        newTime = np.linspace(time[low], time[high], len(time[low:high]))
+        f = InterpolatedUnivariateSpline(time[low:high], intensity[low:high])
+        newIntensity = f(newTime)
+        ax.fill_between(time[low:high], 0, newIntensity, alpha=0.5)
+        ax.text(i[1], max(intensity[low:high]), i[0])
+    pdf.savefig(fig)
+
+
+class DetailPlotRenderer(object):
+    """Renderer of the detail pages of the analytes.
+
+    The figure, its seven lines and the legend are created once, every
+    page only updates the data of the lines, the legend texts, the title
+    and the axis limits before it is saved. A worker process renders all
+    detail pages of all its reports with a single renderer (see
+    detailRenderer).
+    """
+
+    LABELS = ('Raw Data', 'Background', 'Noise', 'Univariate Spline', 'Gaussian Fit', 'Signal', 'FWHM')
+
+    def __init__(self):
+        self.figure = Figure(figsize=(8, 6))
+        self.ax = self.figure.add_subplot(111)
+        self.raw, = self.ax.plot([], [], 'b*')
+        self.background, = self.ax.plot([], [], 'red')
+        self.noise, = self.ax.plot([], [], color='green')
+        self.spline, = self.ax.plot([], [], color='blue', linestyle='dashed')
+        self.gauss, = self.ax.plot([], [], color='green', linestyle='dashed')
+        self.signal, = self.ax.plot([], [], color='orange', linestyle='dotted')
+        self.fwhm, = self.ax.plot([], [], color='red', linestyle='dashed')
+        self.legend = self.ax.legend(self.LABELS, loc='best')
+        self.ax.set_xlabel("Retention Time [m]")
+        self.ax.set_ylabel("Intensity [au]")
+
+    def render(self, pdf, details):
+        """ Add the detail page of a single analyte to the report (see plotIndividual) """
+        # Unpack details
+        low = details['low']
+        high = details['high']
+        fwhm = details['fwhm']
+        NOBAN = details['NOBAN']
+        height = details['height']
+        residual = details['residual']
+        i = details['i']
+        newX, newY = details['newData']
+        newGaussX, newGaussY = details['newGauss']
+        time, intensity = details['data']
+        maxIndex = low + int(np.argmax(intensity[low:high]))
+        maxIntensity = intensity[maxIndex]
+
+        # Update the artists
+        self.raw.set_data(time[low:high], intensity[low:high])
+        self.background.set_data((newX[0], newX[-1]), (NOBAN['Background'], NOBAN['Background']))
+        self.noise.set_data((newX[0], newX[-1]), (NOBAN['Background'] + NOBAN['Noise'],
+                                                  NOBAN['Background'] + NOBAN['Noise']))
+        self.spline.set_data(newX, newY)
+        self.gauss.set_data(newGaussX, newGaussY)
+        self.signal.set_data((time[maxIndex], time[maxIndex]), (NOBAN['Background'], maxIntensity))
+        self.fwhm.set_data((min(max(fwhm['center'] - fwhm['width'], newX[0]), newX[-1]),
+                            max(min(fwhm['center'] + fwhm['width'], newX[-1]), newX[0])), (height, height))
+        texts = self.legend.get_texts()
+        texts[4].set_text('Gaussian Fit (' + str(int(residual * 100)) + '%)')
+        texts[5].set_text('Signal (S/N ' + str(round((maxIntensity - NOBAN['Background']) / NOBAN['Noise'], 1)) + ")")
+        texts[6].set_text("FWHM:" + "{0:.2f}".format(fwhm['fwhm']))
+        self.ax.set_title("Detail view: " + str(i[0]))
+        self.ax.relim()
+        self.ax.autoscale_view()
+        pdf.savefig(self.figure)
+
+
+_detailRenderer = None
+
+
+def detailRenderer():
+    """ Return the DetailPlotRenderer of this process, which is created on first use """
+    global _detailRenderer
+    if _detailRenderer is None:
+        _detailRenderer = DetailPlotRenderer()
+    return _detailRenderer
+
+
+def resetDetailRenderer():
+    """ Discard the DetailPlotRenderer of this process, the next detail page creates a new one """
+    global _detailRenderer
+    _detailRenderer = None
+
+
+def plotIndividual(pdf, details):
+    """Add a detail page of a single analyte to the report.
+
+    The detail page shows the raw data, background, noise, the spline
+    through the data, the fitted Gaussian, the signal and the FWHM.
+    """
+    detailRenderer().render(pdf, details)
+
+
+def reportName(batchFolder, name):
+    """ Return the file name of the PDF report of a chromatogram """
+    return os.path.join(batchFolder, os.path.splitext(os.path.basename(name))[0] + ".pdf")
+
+
+def payloadName(batchFolder, name):
+    """ Return the file name of the plot payload of a chromatogram """
+    return os.path.join(batchFolder, os.path.splitext(os.path.basename(name))[0] + PAYLOAD_EXTENSION)
+
+
+def overviewPayload(peaks, name, time, intensity, start, end):
+    """Return the data of an overview page (see plotOverview).
+
+    Only the part of the chromatogram that is shown (between start and
+    end or in the window of any analyte) is kept.
+    """
+    low = bisect.bisect_left(time, min([start] + [i[1] - i[2] for i in peaks]))
+    high = bisect.bisect_right(time, max([end] + [i[1] + i[2] for i in peaks])) + 1
+    return {'peaks': [list(i) for i in peaks], 'name': name, 'time': np.asarray(time[low:high]),
+            'intensity': np.asarray(intensity[low:high]), 'start': start, 'end': end}
+
+
+def detailPayload(details):
+    """Return the data of a detail page (see plotIndividual).
+
+    Only the data points of the quantitation window are kept of the
+    chromatogram.
+    """
+    low, high = details['low'], details['high']
+    time, intensity = details['data']
+    payload = {key: details[key] for key in ('fwhm', 'height', 'NOBAN', 'residual')}
+    payload.update({'i': list(details['i']), 'low': 0, 'high': high - low,
+                    'newData': details['newData'], 'newGauss': details['newGauss'],
+                    'data': (np.asarray(time[low:high]), np.asarray(intensity[low:high]))})
+    return payload
+
+
+def savePayload(filename, payload):
+    """Write the plot payload of a report to disk.
+
+    The payload is a dict with the 'Name', 'Version' and file name
+    ('Report') of the report, its 'Overview' (see overviewPayload, or
+    None) and a list of 'Details' (see detailPayload). The arrays are
+    stored in a .npz file and everything else as JSON, so a payload is
+    read back without pickling.
+    """
+    arrays = {}
+    metadata = {key: payload[key] for key in ('Name', 'Version', 'Report')}
+    overview = payload['Overview']
+    if overview is not None:
+        arrays['overview_time'], arrays['overview_intensity'] = overview['time'], overview['intensity']
+        metadata['Overview'] = {key: overview[key] for key in ('peaks', 'name', 'start', 'end')}
+    metadata['Details'] = []
+    for index, details in enumerate(payload['Details']):
+        values = details['newData'] + details['newGauss'] + tuple(details['data'])
+        for key, value in zip(DETAIL_ARRAYS, values):
+            arrays['detail%d_%s' % (index, key)] = value
+        metadata['Details'].append({key: details[key] for key in ('fwhm', 'height', 'NOBAN', 'residual', 'i')})
+    np.savez(filename, metadata=np.array(json.dumps(metadata)), **arrays)
+
+
+def loadPayload(filename):
+    """ Read a plot payload written by savePayload """
+    with np.load(filename, allow_pickle=False) as data:
+        metadata = json.loads(str(data['metadata']))
+        payload = {key: metadata[key] for key in ('Name', 'Version', 'Report')}
+        payload['Overview'] = None
+        if 'Overview' in metadata:
+            payload['Overview'] = dict(metadata['Overview'], time=data['overview_time'],
+                                       intensity=data['overview_intensity'])
+        payload['Details'] = []
+        for index, details in enumerate(metadata['Details']):
+            newX, newY, newGaussX, newGaussY, time, intensity = [data['detail%d_%s' % (index, key)]
+                                                                 for key in DETAIL_ARRAYS]
+            payload['Details'].append(dict(details, low=0, high=len(time), newData=(newX, newY),
+                                           newGauss=(newGaussX, newGaussY), data=(time, intensity)))
+    return payload
+
+
+def renderPayload(filename, remove=False):
+    """Render the report of a plot payload file.
+
+    This function is executed by the report worker processes. Returns the
+    file name of the report.
+
+    Keyword arguments:
+    filename -- plot payload file (see savePayload)
+    remove -- remove the payload file once the report is written
+    """
+    payload = loadPayload(filename)
+    pdf = openReport(payload['Report'], payload['Name'], payload['Version'])
+    overview = payload['Overview']
+    if overview is not None:
+        plotOverview(pdf, overview['peaks'], overview['name'], overview['time'], overview['intensity'],
+                     overview['start'], overview['end'])
+    for details in payload['Details']:
+        plotIndividual(pdf, details)
+    pdf.close()
+    if remove:
+        os.remove(filename)
+    return payload['Report']
@@ -1,9 +1,15 @@
 class PowerLawCall:
-    def __init__(self, a, b, c):
+    def __init__(self, a, b, c, rms=None, nfev=None, success=None, message=None):
         self.a = a
         self.b = b
         self.c = c
 
+        # Fit statistics, None if the parameters were not fitted
+        self.rms = rms
+        self.nfev = nfev
+        self.success = success
+        self.message = message
+
     def __call__(self, x):
         return (self.a * (x**self.b)) + self.c
 
@@ -1,2 +1,11 @@
+from . import cache
 from .PowerLawCall import PowerLawCall
-from .math import gauss_function, fwhm, hwhm, peak_centre, power_law
+from .background import BackgroundProfile, background_noise, noban, rolling_background_noise
+from .database import ResultsDatabase
+from .fitting import FitTimeout, caruana_guess, fit_gaussian, fit_power_law
+from .math import (gauss_function, gauss_jacobian, fwhm, hwhm, multi_gauss_function, multi_gauss_jacobian, peak_centre,
+                   power_law, power_law_jacobian)
+from .readers import read_text_export
+from .results import ResultStore, ResultWriter
+from .sampling import grid_extrema, inflection_points, insert_points, resample, spline_roots
+from .segment_tree import MaxSegmentTree
@@ -0,0 +1,214 @@
+import math
+import sys
+import numpy as np
+
+PROFILE_TYPE = np.dtype([('background', np.float64), ('rms', np.float64), ('mm', np.float64)])
+
+
+def rolling_background_noise(y, slice_points=5):
+    """Return the rolling background and noise profile of a signal.
+
+    This function determines the average, the standard deviation (RMS)
+    and the maximum difference (MM) of every segment of slice_points
+    consecutive data points in a single vectorized pass. The average and
+    RMS are taken from cumulative sums of the (centred) data and its
+    squares, the maximum difference from a running maximum and minimum
+    over the shifted data. Element i of the returned array describes the
+    segment y[i:i + slice_points].
+
+    Keyword arguments:
+    y -- array of intensities
+    slice_points -- number of data points per segment
+    """
+    y = np.asarray(y, dtype=np.float64)
+    count = len(y) - slice_points + 1
+    if slice_points < 1 or count < 1:
+        return np.zeros(0, dtype=PROFILE_TYPE)
+
+    # Centring the data keeps the sum of squares from cancelling out
+    offset = np.mean(y)
+    centred = y - offset
+    mean = _rolling_sum(centred, slice_points) / slice_points
+    mean_square = _rolling_sum(centred ** 2, slice_points) / slice_points
+
+    maximum = y[:count].copy()
+    minimum = y[:count].copy()
+    for shift in range(1, slice_points):
+        np.maximum(maximum, y[shift:(shift + count)], out=maximum)
+        np.minimum(minimum, y[shift:(shift + count)], out=minimum)
+
+    profile = np.zeros(count, dtype=PROFILE_TYPE)
+    profile['background'] = mean + offset
+    profile['rms'] = np.sqrt(np.maximum(mean_square - mean ** 2, 0))
+    profile['mm'] = maximum - minimum
+    return profile
+
+
+def _rolling_sum(y, slice_points):
+    sums = np.concatenate(([0.], np.cumsum(y)))
+    return sums[slice_points:] - sums[:-slice_points]
+
+
+def background_noise(y, slice_points=5, noise_method="RMS", profile=None):
+    """Return the background and noise of a signal.
+
+    The background is the lowest average of all segments of slice_points
+    data points (excluding the final segment, as the original loop did),
+    the noise is the standard deviation (RMS) or the maximum difference
+    (MM) of that same segment. Rolling averages are used to locate the
+    segment, after which the (near) tied candidates are re-evaluated
+    exactly so that the first lowest segment is picked.
+
+    Keyword arguments:
+    y -- array of intensities
+    slice_points -- number of data points per segment
+    noise_method -- either "RMS" or "MM"
+    profile -- optional precomputed rolling_background_noise(y, slice_points)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= slice_points or slice_points < 1:
+        return sys.maxsize, 1
+    if profile is None:
+        means = _rolling_sum(y - np.mean(y), slice_points) / slice_points
+    else:
+        means = profile['background']
+    means = means[:(len(y) - slice_points)]
+
+    tolerance = 1e-9 * max(np.max(np.abs(y)), 1.0)
+    candidates = np.flatnonzero(means <= np.min(means) + tolerance)
+    exact = np.mean(y[candidates[:, None] + np.arange(slice_points)], axis=1)
+    index = candidates[int(np.argmin(exact))]
+    segment = y[index:(index + slice_points)]
+
+    background = np.mean(segment)
+    noise = 0
+    if noise_method == "MM":
+        noise = max(segment) - min(segment)
+    elif noise_method == "RMS":
+        noise = np.std(segment)
+    if noise == 0:
+        noise = 1
+    return background, noise
+
+
+def noban(data, noban_start=0.25, noise_method="RMS"):
+    """Determine background and noise using the NOBAN algorithm.
+
+    This function is based on the NOBAN algorithm, published by Jansen et
+    al, in 2016. The function sorts the data by increasing intensity,
+    takes an initial estimate (defined in noban_start) and calculates
+    the background (average) and noise (root-mean-square or the maximum
+    difference) from the initial estimate. The region is then grown over
+    the subsequent data points that fall below the current average plus
+    three times the noise (as any point that is > 3SD is considered a
+    signal), or shrunk if the initial estimate was too greedy, which is
+    repeated until the region no longer changes.
+
+    The average and noise of any region are taken from prefix sums of the
+    sorted values and their squares (or the first and last value for the
+    maximum difference), and the region boundary is found with a binary
+    search, so every step is O(log n) instead of O(n).
+
+    Returns a dict with the 'Background' and 'Noise'.
+
+    Keyword arguments:
+    data -- list of numbers
+    noban_start -- fraction of the data used as the initial estimate
+    noise_method -- either "RMS" or "MM"
+    """
+    sorted_data = np.sort(np.asarray(data, dtype=np.float64))
+    if len(sorted_data) == 0:
+        return {'Background': np.nan, 'Noise': 1}
+
+    # Centring the data keeps the sum of squares from cancelling out
+    offset = sorted_data[len(sorted_data) // 2]
+    centred = sorted_data - offset
+    sums = np.concatenate(([0.], np.cumsum(centred)))
+    squares = np.concatenate(([0.], np.cumsum(centred ** 2)))
+
+    def calc_values(size):
+        average = sums[size] / size
+        if noise_method == "MM":
+            noise = sorted_data[size - 1] - sorted_data[0]
+        else:
+            noise = math.sqrt(max(squares[size] / size - average ** 2, 0))
+        return average + offset, noise
+
+    curr_size = max(int(noban_start * float(len(sorted_data))), 1)
+    curr_average, curr_noise = calc_values(curr_size)
+    visited = set()
+    while curr_size not in visited:
+        visited.add(curr_size)
+        threshold = curr_average + 3 * curr_noise
+        # Grow up to the last point below the threshold (like the original,
+        # growing stops when the point after the next one is a signal) or
+        # shrink until the last included point is below the threshold.
+        grow_size = int(np.searchsorted(sorted_data, threshold, side='left')) - 1
+        shrink_size = max(int(np.searchsorted(sorted_data, threshold, side='right')), 1)
+        if grow_size > curr_size:
+            curr_size = grow_size
+        elif shrink_size < curr_size:
+            curr_size = shrink_size
+        else:
+            break
+        curr_average, curr_noise = calc_values(curr_size)
+    if curr_noise == 0:
+        curr_noise = 1
+    return {'Background': curr_average, 'Noise': curr_noise}
+
+
+class BackgroundProfile(object):
+    """Rolling background and noise profile shared by the windows of a single chromatogram.
+
+    The background windows of closely spaced analytes overlap heavily.
+    For the MT method, the rolling background and noise profile of the
+    chromatogram is computed once and shared by all (overlapping)
+    windows, so every window only searches its part of that profile.
+    The profile depends on the intensities alone, so it can be shared by
+    the calibrant and analyte windows of the raw and calibrated
+    chromatogram, as calibration only changes the time. A profile must
+    only be used for a single array of intensities. The NOBAN method
+    sorts the data of every window and has nothing to share. The results
+    of the windows themselves are not kept, as the windows of different
+    peaks (and time axes) never coincide.
+    """
+
+    def __init__(self):
+        self.profiles = {}
+        self.windows = 0
+        self.reuses = 0
+
+    def get(self, intensity, low, high, method="MT", noise_method="RMS", slice_points=5, noban_start=0.25):
+        """Return the background and noise of intensity[low:high].
+
+        Returns a dict with the 'Background' and 'Noise'.
+
+        Keyword arguments:
+        intensity -- array of intensities of the chromatogram
+        low -- index of the first data point of the window
+        high -- index past the last data point of the window
+        method -- either "MT" or "NOBAN"
+        noise_method -- either "RMS" or "MM"
+        slice_points -- number of data points per segment (MT)
+        noban_start -- fraction of the data used as the initial estimate (NOBAN)
+        """
+        self.windows += 1
+        if method == "NOBAN":
+            return noban(intensity[low:high], noban_start, noise_method)
+        profile = self.profile(intensity, slice_points)
+        background, noise = background_noise(intensity[low:high], slice_points, noise_method,
+                                             profile[low:max(high - slice_points + 1, low)])
+        return {'Background': background, 'Noise': noise}
+
+    def profile(self, intensity, slice_points=5):
+        """ Return the rolling_background_noise profile of the chromatogram, computed once per slice_points """
+        try:
+            profile = self.profiles[slice_points]
+            self.reuses += 1
+        except KeyError:
+            profile = self.profiles[slice_points] = rolling_background_noise(intensity, slice_points)
+        return profile
+
+    def __repr__(self):
+        return "BackgroundProfile(%d windows, %d profiles, %d profile reuses)" % (
+            self.windows, len(self.profiles), self.reuses)
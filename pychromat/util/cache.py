@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# The cache is off unless PYCHROMAT_CACHE=1 (or cache.enabled = True), the batch uses settings.traceCache
+enabled = os.environ.get("PYCHROMAT_CACHE", "0") == "1"
+cache_dir = os.environ.get("PYCHROMAT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pychromat"))
+max_size = 512 * 1024 * 1024
+
+# Bump whenever the parsers change what they return for the same file
+FORMAT_VERSION = 1
+HASH_BLOCK = 64 * 1024
+
+
+def cache_key(file):
+    """Return the cache key of a raw data file.
+
+    The key is a digest of the absolute path, size and modification time
+    of the file and a hash of its content. The content hash only covers
+    the first and last HASH_BLOCK bytes, which catches rewritten exports
+    that kept their size and timestamp without reading the whole file.
+
+    Keyword arguments:
+    file -- path of the raw data file
+    """
+    stat = os.stat(file)
+    digest = hashlib.sha1()
+    digest.update(("%s\t%d\t%d\t%d" % (os.path.abspath(file), stat.st_size, stat.st_mtime_ns,
+                                       FORMAT_VERSION)).encode('utf-8'))
+    with open(file, 'rb') as fr:
+        digest.update(fr.read(HASH_BLOCK))
+        if stat.st_size > 2 * HASH_BLOCK:
+            fr.seek(-HASH_BLOCK, os.SEEK_END)
+            digest.update(fr.read(HASH_BLOCK))
+        else:
+            digest.update(fr.read())
+    return digest.hexdigest()
+
+
+def load(file):
+    """Return the cached (data, metadata) of a raw data file, or None.
+
+    The data is returned as a read-only memory map of the binary sidecar,
+    so no parsing or copying takes place. A hit marks the entry as
+    recently used for the eviction policy.
+    """
+    try:
+        base = os.path.join(cache_dir, cache_key(file))
+        data = np.load(base + ".npy", mmap_mode='r')
+        with open(base + ".json", 'r') as fr:
+            metadata = json.load(fr)
+        os.utime(base + ".npy")
+    except (OSError, ValueError):
+        return None
+    return data, metadata
+
+
+def store(file, data, metadata=None):
+    """Store the parsed data (and metadata) of a raw data file.
+
+    The entry is written to temporary files first and then moved into
+    place, so that concurrent readers never see a partial entry, the
+    temporary file of a failed write is removed. The cache is evicted
+    down to max_size afterwards.
+    """
+    temp = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        base = os.path.join(cache_dir, cache_key(file))
+        temp = base + ".%d.tmp" % os.getpid()
+        with open(temp, 'w') as fw:
+            json.dump(metadata or {}, fw)
+        os.replace(temp, base + ".json")
+        with open(temp, 'wb') as fw:
+            np.save(fw, np.ascontiguousarray(data))
+        os.replace(temp, base + ".npy")
+    except (OSError, ValueError):
+        if temp is not None and os.path.exists(temp):
+            os.remove(temp)
+        return
+    evict()
+
+
+def evict(limit=None):
+    """Remove the least recently used entries until the cache fits in limit bytes.
+
+    Keyword arguments:
+    limit -- maximum size of the cache in bytes, defaults to max_size
+    """
+    if limit is None:
+        limit = max_size
+    entries = []
+    total = 0
+    try:
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+    except OSError:
+        return
+    for mtime, size, path in sorted(entries):
+        if total <= limit:
+            break
+        for name in (path, os.path.splitext(path)[0] + ".json"):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+        total -= size
+
+
+def clear():
+    """ Remove all entries from the cache """
+    evict(0)
@@ -0,0 +1,247 @@
+import math
+import sys
+import numpy as np
+import numpy.polynomial.polynomial as P
+import scipy.interpolate
+import scipy.linalg
+
+from .PowerLawCall import PowerLawCall
+from .fitting import fit_power_law
+
+
+def ultraPerformanceCalibration(measured, expected, minimum, maximum, min_improvement=0.05, use_interpolation=False):
+    """ This function tries various calibration methods, starting with
+    polynomials, followed by a power law function and lastly tries two
+    interpolation methods (Pchip and Akima1D). The latter methods should
+    always return an RMS of 0, which is why the function will only use
+    those if they give a significant improvement in RMS (defined in
+    min_improvement) and if the user has selected to use interpolation
+    methods as well (defined in use_interpolation).
+
+    See select_model for the RMS and diagnostics of the chosen model.
+
+    INPUT1: List of measured data points
+    INPUT2: List of expected data points
+    OUTPUT: Function object
+    """
+    return select_model(measured, expected, minimum, maximum, min_improvement, use_interpolation)['Function']
+
+
+def select_model(measured, expected, minimum, maximum, min_improvement=0.05, use_interpolation=False):
+    """Select the calibration model for the measured and expected times.
+
+    The candidates are tried in the order of ultraPerformanceCalibration;
+    a candidate replaces the current model if it is monotonically
+    increasing between minimum and maximum and improves the RMS by more
+    than min_improvement, the polynomials stop at the first degree that
+    is not monotone. All polynomial degrees are fitted from a single QR
+    decomposition of the Vandermonde matrix and their residuals are
+    evaluated at once; monotonicity is checked analytically, from the
+    derivative at the boundaries and at its own extrema, instead of on a
+    dense grid.
+
+    Returns a dict with the chosen calibration function ('Function', None
+    if no candidate was suitable), its name ('Model') and 'RMS', and a
+    list with the 'Model', 'RMS' and 'Monotone' of every candidate that
+    was evaluated ('Candidates').
+
+    Keyword arguments:
+    measured -- list of measured times
+    expected -- list of expected times
+    minimum -- lower bound of the times that will be calibrated
+    maximum -- upper bound of the times that will be calibrated
+    min_improvement -- minimum relative improvement in RMS
+    use_interpolation -- also try the Pchip and Akima1D interpolators
+    """
+    measured = np.asarray(measured, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    selected = {'Function': None, 'Model': None, 'RMS': sys.maxsize, 'Candidates': []}
+
+    def consider(model, rms, monotone):
+        """ Record a candidate, return if it replaces the current model """
+        selected['Candidates'].append({'Model': model, 'RMS': rms, 'Monotone': monotone})
+        if monotone and rms < selected['RMS'] - min_improvement * selected['RMS']:
+            selected.update({'Model': model, 'RMS': rms})
+            return True
+        return False
+
+    # Polynomials between 1 and len(expected). A single QR decomposition of
+    # the (column scaled) Vandermonde matrix gives the least squares fit of
+    # every degree, as the fit of degree i only uses its first i + 1 columns.
+    count = len(expected)
+    if count > 1:
+        vandermonde = np.vander(measured, count, increasing=True)
+        scale = np.sqrt(np.sum(vandermonde ** 2, axis=0))
+        q, r = np.linalg.qr(vandermonde / scale)
+        projection = q.T.dot(expected)
+        coefficients = np.zeros((count, count - 1))
+        for i in range(1, count):
+            coefficients[:i + 1, i - 1] = scipy.linalg.solve_triangular(r[:i + 1, :i + 1], projection[:i + 1])
+        coefficients /= scale[:, None]
+        rms = np.sqrt(np.mean((vandermonde.dot(coefficients) - expected[:, None]) ** 2, axis=0))
+        for i in range(1, count):
+            coefficient = coefficients[:i + 1, i - 1]
+            monotone = _is_increasing(coefficient, minimum, maximum)
+            if consider("Polynomial " + str(i), float(rms[i - 1]), monotone):
+                selected['Function'] = np.poly1d(coefficient[::-1])
+            if not monotone:
+                break
+
+    # Power Law, a * x ** b + c is increasing on [0, inf) when a * b > 0
+    f = fit_power_law(measured, expected)
+    if consider("Power Law", f.rms, bool(f.success and minimum >= 0 and f.a * f.b > 0)):
+        selected['Function'] = f
+
+    if use_interpolation:
+        # Monotonic Piecewise Cubic Hermite Interpolating Polynomial
+        f = scipy.interpolate.PchipInterpolator(measured, expected)
+        if consider("Pchip", math.sqrt(np.mean((f(measured) - expected) ** 2)), True):
+            selected['Function'] = f
+
+        # Akima 1D Interpolator
+        f = scipy.interpolate.Akima1DInterpolator(measured, expected)
+        if consider("Akima1D", math.sqrt(np.mean((f(measured) - expected) ** 2)), True):
+            selected['Function'] = f
+
+    return selected
+
+
+class WarmStart(object):
+    """Calibration model of the previous sample of a batch.
+
+    Consecutive injections on the same column give nearly identical
+    calibration curves, so the model selected for the previous sample is
+    refitted to the calibrants of the next one first, starting from its
+    previous coefficients (see refit_model). The full model search of
+    select_model is only run when the refitted model is no longer
+    monotone or when its RMS exceeds the RMS of the last full search by
+    more than min_improvement. The number of samples that took this fast
+    path and the number of full searches are counted.
+    """
+
+    def __init__(self):
+        self.selected = None
+        self.reference = None
+        self.fast = 0
+        self.searches = 0
+
+    def select(self, measured, expected, minimum, maximum, min_improvement=0.05, use_interpolation=False):
+        """Select the calibration model of the next sample.
+
+        Returns the select_model (or refit_model) dict, with 'FastPath'
+        set if the model of the previous sample was reused.
+
+        Keyword arguments:
+        see select_model
+        """
+        if self.selected is not None:
+            refit = refit_model(self.selected, measured, expected, minimum, maximum)
+            if refit['Function'] is not None and refit['RMS'] <= self.reference + min_improvement * self.reference:
+                refit['FastPath'] = True
+                self.selected = refit
+                self.fast += 1
+                return refit
+        selected = select_model(measured, expected, minimum, maximum, min_improvement, use_interpolation)
+        selected['FastPath'] = False
+        self.searches += 1
+        if selected['Function'] is not None:
+            self.selected, self.reference = selected, selected['RMS']
+        return selected
+
+    def fast_path_rate(self):
+        """ Return the fraction of samples that reused the model of the previous sample """
+        samples = self.fast + self.searches
+        return self.fast / samples if samples else 0.0
+
+    def __repr__(self):
+        return "WarmStart(%d fast path, %d full searches, %.1f%% fast path)" % (
+            self.fast, self.searches, 100 * self.fast_path_rate())
+
+
+def refit_model(selected, measured, expected, minimum, maximum):
+    """Refit a previously selected calibration model to new data.
+
+    A polynomial is refitted with the same degree, a power law starts
+    from the previous exponent and an interpolator is rebuilt on the new
+    data. Returns a dict like select_model, whose 'Function' is None if
+    the refitted model is not monotonically increasing between minimum
+    and maximum or there are too few data points for it.
+
+    Keyword arguments:
+    selected -- select_model (or refit_model) dict of the previous data
+    measured -- list of measured times
+    expected -- list of expected times
+    minimum -- lower bound of the times that will be calibrated
+    maximum -- upper bound of the times that will be calibrated
+    """
+    measured = np.asarray(measured, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    model, function, monotone = selected['Model'], None, False
+    if model.startswith("Polynomial "):
+        degree = int(model.split()[1])
+        if len(expected) > degree:
+            coefficient = P.polyfit(measured, expected, degree)
+            function, monotone = np.poly1d(coefficient[::-1]), _is_increasing(coefficient, minimum, maximum)
+    elif model == "Power Law":
+        function = fit_power_law(measured, expected, b0=selected['Function'].b)
+        monotone = bool(function.success and minimum >= 0 and function.a * function.b > 0)
+    elif model == "Pchip":
+        function, monotone = scipy.interpolate.PchipInterpolator(measured, expected), True
+    elif model == "Akima1D":
+        function, monotone = scipy.interpolate.Akima1DInterpolator(measured, expected), True
+    rms = math.sqrt(np.mean((function(measured) - expected) ** 2)) if function is not None else sys.maxsize
+    return {'Function': function if monotone else None, 'Model': model, 'RMS': rms,
+            'Candidates': [{'Model': model, 'RMS': rms, 'Monotone': monotone}]}
+
+
+def apply(function, time):
+    """Return the calibrated time axis, function(time), as an array.
+
+    The calibration functions (np.poly1d, PowerLawCall and the scipy
+    interpolators) all evaluate an array of times at once.
+
+    Keyword arguments:
+    function -- calibration function (see select_model)
+    time -- array of times
+    """
+    return np.asarray(function(np.asarray(time, dtype=np.float64)), dtype=np.float64)
+
+
+def _is_increasing(coefficients, minimum, maximum):
+    """Return if a polynomial is strictly increasing between minimum and maximum.
+
+    The lowest derivative on the interval is found at the boundaries or
+    at the real roots of the second derivative within the interval.
+
+    Keyword arguments:
+    coefficients -- coefficients of the polynomial, in increasing order
+    minimum -- lower bound of the interval
+    maximum -- upper bound of the interval
+    """
+    derivative = P.polyder(coefficients)
+    points = [minimum, maximum]
+    if len(derivative) > 2:
+        roots = P.polyroots(P.polyder(derivative))
+        roots = roots[np.isreal(roots)].real
+        points.extend(roots[(roots > minimum) & (roots < maximum)])
+    return bool(np.min(P.polyval(np.asarray(points, dtype=np.float64), derivative)) > 0)
+
+
+def describe(function):
+    """ Return a human readable description of a calibration function """
+    if isinstance(function, PowerLawCall):
+        formula = function.describe()
+    elif isinstance(function, np.poly1d):
+        formula = ""
+        for index, i in enumerate(function):
+            if index < len(function):
+                formula += "{0:.2e}".format(i) + "x^" + str(len(function) - index) + " + "
+            else:
+                formula += "{0:.2e}".format(i)
+    elif isinstance(function, scipy.interpolate.Akima1DInterpolator):
+        formula = "Akima 1D Interpolation"
+    elif isinstance(function, scipy.interpolate.PchipInterpolator):
+        formula = "Monotonic Piecewise Cubic Hermite Interpolating Polynomial"
+    else:
+        formula = "Unknown"
+    return formula
@@ -0,0 +1,195 @@
+import os
+import sqlite3
+from datetime import datetime
+
+from .quantitation import RESULT_TYPE
+
+# Columns of the analytes table, besides its id, sample and name
+ANALYTE_FIELDS = RESULT_TYPE.names
+# The statistics are refreshed when the number of analyte rows grew or shrank by more than this factor
+ANALYZE_FACTOR = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL,
+    started TEXT NOT NULL,
+    finished TEXT NOT NULL,
+    version TEXT
+);
+CREATE TABLE IF NOT EXISTS settings (
+    batch INTEGER NOT NULL REFERENCES batches (id),
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (batch, name)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    batch INTEGER NOT NULL REFERENCES batches (id),
+    name TEXT NOT NULL,
+    time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calibrations (
+    sample INTEGER PRIMARY KEY REFERENCES samples (id),
+    formula TEXT
+);
+CREATE TABLE IF NOT EXISTS analytes (
+    id INTEGER PRIMARY KEY,
+    sample INTEGER NOT NULL REFERENCES samples (id),
+    name TEXT NOT NULL,
+    %s
+);
+CREATE UNIQUE INDEX IF NOT EXISTS batches_folder ON batches (folder);
+CREATE UNIQUE INDEX IF NOT EXISTS samples_batch_name ON samples (batch, name);
+CREATE INDEX IF NOT EXISTS samples_name ON samples (name);
+CREATE INDEX IF NOT EXISTS samples_time ON samples (time);
+CREATE INDEX IF NOT EXISTS analytes_name ON analytes (name, sample);
+CREATE INDEX IF NOT EXISTS analytes_sample ON analytes (sample, name);
+""" % ",\n    ".join('"%s" %s' % (field, "INTEGER" if RESULT_TYPE[field].kind == 'i' else "REAL")
+                    for field in ANALYTE_FIELDS)
+
+
+class ResultsDatabase(object):
+    """SQLite database with the results of all batches.
+
+    Every batch is stored with its settings, samples (with their
+    calibration formula) and the results of all analytes of every sample
+    (the fields of quantitation.RESULT_TYPE, NaN is stored as NULL). A
+    batch is inserted with a few executemany statements inside a single
+    transaction. A batch is identified by its (absolute) folder and a
+    sample by its batch and name, so running a batch again replaces the
+    earlier results of its samples instead of adding duplicates. The
+    analytes are indexed on name and sample, and the trend of an analyte
+    over any number of batches is a single query that starts from that
+    index. The time of a sample is the (ISO 8601) start time of the run
+    of its batch that produced it. The statistics of the indexes are only
+    refreshed (ANALYZE) when the number of analyte rows changed by more
+    than ANALYZE_FACTOR since they were last gathered.
+
+    Keyword arguments:
+    filename -- the database file, which is created if it does not exist
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, isolation_level=None)
+        self.connection.executescript(SCHEMA)
+        # Sampled statistics (SQLite 3.32), older versions ignore the unknown pragma and analyze all rows
+        self.connection.execute("PRAGMA analysis_limit = 400")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add_batch(self, store, settings, folder, started=None, version=None):
+        """Insert (or replace) the results of a batch, returns the id of the batch.
+
+        The settings and the samples of an earlier run of the same
+        folder are replaced, samples of that run that are not part of
+        this one are kept.
+
+        Keyword arguments:
+        store -- util.ResultStore of the batch
+        settings -- settings object (e.g. BatchSettings), all its attributes are stored
+        folder -- the batch folder
+        started -- datetime at which the batch started, None for now
+        version -- version of the software that created the results
+        """
+        finished = datetime.now().isoformat()
+        started = started.isoformat() if started is not None else finished
+        folder = os.path.abspath(str(folder))
+        names = store.samples.tolist()
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # An update, or an insert if the folder is new (INSERT ... ON CONFLICT needs SQLite 3.24)
+            cursor.execute("UPDATE batches SET started = ?, finished = ?, version = ? WHERE folder = ?",
+                           (started, finished, version, folder))
+            if cursor.rowcount == 0:
+                cursor.execute("INSERT INTO batches (folder, started, finished, version) VALUES (?, ?, ?, ?)",
+                               (folder, started, finished, version))
+            batch = cursor.execute("SELECT id FROM batches WHERE folder = ?", (folder,)).fetchone()[0]
+            cursor.execute("DELETE FROM settings WHERE batch = ?", (batch,))
+            cursor.executemany("INSERT INTO settings (batch, name, value) VALUES (?, ?, ?)",
+                               [(batch, name, str(value)) for name, value in sorted(vars(settings).items())])
+
+            # Results of an earlier run of the same samples
+            replaced = "(SELECT id FROM samples WHERE batch = ? AND name = ?)"
+            for table, column in (("analytes", "sample"), ("calibrations", "sample"), ("samples", "id")):
+                cursor.executemany("DELETE FROM %s WHERE %s IN %s" % (table, column, replaced),
+                                   [(batch, name) for name in names])
+
+            # Explicit sample ids, as executemany does not report the ids it inserted
+            first = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM samples").fetchone()[0]
+            samples = list(range(first, first + len(store)))
+            cursor.executemany("INSERT INTO samples (id, batch, name, time) VALUES (?, ?, ?, ?)",
+                               [(sample, batch, name, started) for sample, name in zip(samples, names)])
+            cursor.executemany("INSERT INTO calibrations (sample, formula) VALUES (?, ?)",
+                               list(zip(samples, store.calibrations.tolist())))
+            analytes = store.analytes.tolist()
+            # The rows are converted a chunk at a time, so a memory mapped store is not read into memory at once
+            rows = (row for chunk in store.chunks() for row in chunk.results.tolist())
+            cursor.executemany("INSERT INTO analytes (sample, name, %s) VALUES (?, ?, %s)" % (
+                ", ".join('"%s"' % field for field in ANALYTE_FIELDS), ", ".join("?" * len(ANALYTE_FIELDS))),
+                               ((sample, name) + values for sample, row in zip(samples, rows)
+                                for name, values in zip(analytes, row)))
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        self.analyze()
+        return batch
+
+    def analyze(self, factor=ANALYZE_FACTOR):
+        """Refresh the (sampled) statistics of the indexes if the number of analytes changed significantly.
+
+        Returns if the statistics were refreshed.
+
+        Keyword arguments:
+        factor -- minimum factor by which the number of analyte rows changed
+        """
+        rows = self.connection.execute("SELECT COUNT(*) FROM analytes").fetchone()[0]
+        try:
+            stat = self.connection.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = 'analytes'").fetchone()
+        except sqlite3.OperationalError:
+            # The statistics table is created by the first ANALYZE
+            stat = None
+        # The first number of the statistics is the (estimated) number of rows
+        analyzed = int(stat[0].split()[0]) if stat is not None else 0
+        if analyzed * factor < rows or rows * factor < analyzed:
+            self.connection.execute("ANALYZE")
+            return True
+        return False
+
+    def trend(self, analyte, field="area", start=None, end=None):
+        """Return the values of a field of an analyte over all batches.
+
+        Returns a list of (time, batch folder, sample name, value) tuples,
+        ordered by time.
+
+        Keyword arguments:
+        analyte -- name of the analyte
+        field -- a field of quantitation.RESULT_TYPE
+        start -- optional datetime or ISO 8601 string, earliest time
+        end -- optional datetime or ISO 8601 string, latest time
+        """
+        if field not in ANALYTE_FIELDS:
+            raise ValueError("Unknown field: " + str(field))
+        # The CROSS JOIN keeps analytes as the outer table, so the query always starts from the analytes_name
+        # index, whatever the statistics of a (small) database suggest
+        query = ('SELECT samples.time, batches.folder, samples.name, analytes."%s" FROM analytes '
+                 'CROSS JOIN samples ON analytes.sample = samples.id CROSS JOIN batches ON samples.batch = batches.id '
+                 'WHERE analytes.name = ?' % field)
+        parameters = [analyte]
+        if start is not None:
+            query += " AND samples.time >= ?"
+            parameters.append(start.isoformat() if isinstance(start, datetime) else start)
+        if end is not None:
+            query += " AND samples.time <= ?"
+            parameters.append(end.isoformat() if isinstance(end, datetime) else end)
+        return self.connection.execute(query + " ORDER BY samples.time, samples.name", parameters).fetchall()
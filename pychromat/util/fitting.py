@@ -0,0 +1,163 @@
+import math
+import time
+import numpy as np
+import scipy.optimize
+
+from .PowerLawCall import PowerLawCall
+from .math import gauss_function, gauss_jacobian, power_law_jacobian
+
+
+class FitTimeout(RuntimeError):
+    """ Raised when a fit exceeds its time budget """
+
+
+def caruana_guess(x, y):
+    """Return a closed form estimate of the a, mu and sigma of a Gaussian.
+
+    The logarithm of a Gaussian is a parabola, so a quadratic polynomial
+    is fitted through (x, ln y) of the positive data points (Caruana's
+    algorithm). The residuals are weighted by y (Guo's correction) so
+    that the noisy tails of the peak do not dominate the estimate.
+    Returns None if the data does not resemble a peak (i.e. the parabola
+    does not open downwards).
+
+    Keyword arguments:
+    x -- array of times
+    y -- array of intensities
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    positive = y > 0
+    if np.count_nonzero(positive) < 3:
+        return None
+    x, y = x[positive], y[positive]
+
+    # Centre x to keep the polynomial well conditioned
+    centre = x[np.argmax(y)]
+    c2, c1, c0 = np.polyfit(x - centre, np.log(y), 2, w=y)
+    if not c2 < 0:
+        return None
+    sigma = math.sqrt(-1 / (2 * c2))
+    mu = -c1 / (2 * c2)
+    a = math.exp(c0 - c1 ** 2 / (4 * c2))
+    if not (np.isfinite(a) and x[0] - centre <= mu <= x[-1] - centre):
+        return None
+    return a, mu + centre, sigma
+
+
+def fit_gaussian(x, y, p0=None, maxfev=None, timeout=None):
+    """Fit a Gaussian function to the data.
+
+    The fit uses the analytic Jacobian of gauss_function and, when no
+    initial guess is given, the closed form estimate of caruana_guess
+    (falling back to the highest point and the width of the points above
+    exp(-0.5) of the maximum), which typically lets the fit converge in a
+    handful of evaluations.
+
+    Returns the fitted a, mu and sigma; raises a RuntimeError (like
+    scipy.optimize.curve_fit) when the fit does not converge within maxfev
+    evaluations, or a FitTimeout (a RuntimeError) when it takes longer than
+    timeout seconds, and a TypeError when there are fewer data points than
+    parameters.
+
+    Keyword arguments:
+    x -- array of times
+    y -- array of intensities
+    p0 -- optional initial guess of a, mu and sigma
+    maxfev -- maximum number of function evaluations, None for the default
+    timeout -- time budget of the fit in seconds, None for no limit
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) < 3:
+        # curve_fit raises a TypeError for this as well, but only when it can count the parameters of function
+        raise TypeError("Unable to fit a Gaussian (3 parameters) to " + str(len(y)) + " data points")
+    if p0 is None:
+        p0 = caruana_guess(x, y)
+    if p0 is None:
+        peak = x[y > np.exp(-0.5) * np.max(y)]
+        p0 = (np.max(y), x[np.argmax(y)], max(0.5 * (np.max(peak) - np.min(peak)), np.finfo(float).eps))
+
+    function, jacobian = gauss_function, gauss_jacobian
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+
+        def function(x, *p):
+            if time.monotonic() > deadline:
+                raise FitTimeout("Gaussian fit exceeded its time budget of " + str(timeout) + " seconds")
+            return gauss_function(x, *p)
+
+    kwargs = {} if maxfev is None else {'maxfev': maxfev}
+    coeff, var_matrix = scipy.optimize.curve_fit(function, x, y, p0, jac=jacobian, **kwargs)
+    return coeff
+
+
+def _linear_power_law(x, y, b):
+    """ Return the least squares a and c of a * x ** b + c for a fixed b """
+    power = x ** b
+    centred = power - np.mean(power)
+    spread = centred.dot(centred)
+    a = centred.dot(y) / spread if spread > 0 else 0.
+    return a, np.mean(y) - a * np.mean(power)
+
+
+def fit_power_law(x, y, b0=1., b_bounds=(0., 2.), maxfev=100, xtol=1e-10):
+    """Fit the power law a * x ** b + c to the data.
+
+    The exponent is kept within b_bounds by a bounded least squares fit,
+    rather than by the discontinuous penalty of power_law, which stalls
+    curve_fit whenever a step leaves the bounds. As a and c enter the
+    model linearly they are solved in closed form for every b (variable
+    projection), which leaves a one dimensional problem in b; this is
+    solved with Gauss-Newton steps from the analytic Jacobian (with the
+    a and c columns projected out), which are clipped to the bounds and
+    halved until the residual decreases.
+
+    Returns a PowerLawCall with the fitted a, b and c and the RMS, number
+    of function evaluations, success (convergence within maxfev
+    evaluations) and message of the fit.
+
+    Keyword arguments:
+    x -- array of (positive) measured times
+    y -- array of expected times
+    b0 -- initial guess of the exponent
+    b_bounds -- lower and upper bound of the exponent
+    maxfev -- maximum number of function evaluations
+    xtol -- tolerance of the exponent
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    low, high = b_bounds
+    b = min(max(b0, low), high)
+    a, c = _linear_power_law(x, y, b)
+    residual = a * x ** b + c - y
+    cost = residual.dot(residual)
+    nfev, message = 1, None
+    while message is None:
+        # Derivative to b of the residual, minus the part that a and c absorb
+        jacobian = power_law_jacobian(x, a, b, c)
+        column = jacobian[:, 1] - np.mean(jacobian[:, 1])
+        power = jacobian[:, 0] - np.mean(jacobian[:, 0])
+        if power.dot(power) > 0:
+            column -= column.dot(power) / power.dot(power) * power
+        if not column.dot(column) > 0:
+            message = "The exponent does not affect the residual"
+            break
+        step = min(max(b - column.dot(residual) / column.dot(column), low), high) - b
+        while True:
+            if abs(step) <= xtol * (1 + abs(b)):
+                message = "The exponent converged"
+                break
+            if nfev >= maxfev:
+                message = "Maximum number of function evaluations exceeded"
+                break
+            new_a, new_c = _linear_power_law(x, y, b + step)
+            new_residual = new_a * x ** (b + step) + new_c - y
+            new_cost = new_residual.dot(new_residual)
+            nfev += 1
+            if new_cost <= cost:
+                a, b, c, residual, cost = new_a, b + step, new_c, new_residual, new_cost
+                break
+            step /= 2.
+    return PowerLawCall(a, b, c, rms=math.sqrt(cost / len(y)), nfev=nfev,
+                        success=not message.startswith("Maximum"), message=message)
@@ -25,6 +25,22 @@ def power_law(x, a, b, c):
     return a * x ** b + c + penalty
 
 
+def power_law_jacobian(x, a, b, c):
+    """Return the Jacobian of the power law a * x ** b + c.
+
+    The columns of the returned (len(x), 3) array contain the partial
+    derivatives to a, b and c of the power law without the penalty of
+    power_law, x must be positive.
+
+    Keyword arguments:
+    x -- array
+    a, b, c -- numbers
+    """
+    x = np.asarray(x, dtype=np.float64)
+    power = x ** b
+    return np.column_stack((power, a * power * np.log(x), np.ones_like(x)))
+
+
 def fwhm(coeff):
     """Calculate the Full-Width at Half Maximum
 
@@ -51,3 +67,47 @@ def hwhm(coeff):
 
 def peak_centre(coeff):
     return coeff[1]
+
+
+def multi_gauss_function(x, *p):
+    """Define and return the sum of several Gaussian functions.
+
+    Keyword arguments:
+    x -- number or array
+    p -- a, mu and sigma numbers of every Gaussian, one after the other
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.zeros(x.shape)
+    for index in range(0, len(p), 3):
+        y += gauss_function(x, *p[index:index + 3])
+    return y
+
+
+def gauss_jacobian(x, *p):
+    """Return the Jacobian of gauss_function.
+
+    The columns of the returned (len(x), 3) array contain the partial
+    derivatives to a, mu and sigma.
+
+    Keyword arguments:
+    x -- array
+    p -- a, mu and sigma numbers
+    """
+    a, mu, sigma = p
+    x = np.asarray(x, dtype=np.float64)
+    offset = x - mu
+    exp = np.exp(-offset ** 2 / (2. * sigma ** 2))
+    return np.column_stack((exp, a * exp * offset / sigma ** 2, a * exp * offset ** 2 / sigma ** 3))
+
+
+def multi_gauss_jacobian(x, *p):
+    """Return the Jacobian of multi_gauss_function.
+
+    Column 3i, 3i + 1 and 3i + 2 of the returned (len(x), len(p)) array
+    contain the partial derivatives to a, mu and sigma of Gaussian i.
+
+    Keyword arguments:
+    x -- array
+    p -- a, mu and sigma numbers of every Gaussian, one after the other
+    """
+    return np.hstack([gauss_jacobian(x, *p[index:index + 3]) for index in range(0, len(p), 3)])
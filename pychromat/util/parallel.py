@@ -0,0 +1,88 @@
+import concurrent.futures
+import os
+import traceback
+
+
+class BatchFailure(object):
+    """ The outcome of a batch item whose worker raised an exception """
+
+    def __init__(self, item, error, details):
+        self.item = item
+        self.error = error
+        self.details = details
+
+    def __repr__(self):
+        return "BatchFailure(%r, %r)" % (self.item, self.error)
+
+
+def map_files(function, items, processes=None, chunksize=1, callback=None):
+    """Apply function to every item using a pool of worker processes.
+
+    Returns the list of the results of imap_files.
+    """
+    return list(imap_files(function, items, processes=processes, chunksize=chunksize, callback=callback))
+
+
+def imap_files(function, items, processes=None, chunksize=1, callback=None):
+    """Apply function to every item using a pool of worker processes.
+
+    The results are yielded as soon as they are available, in the order
+    of items, regardless of the order in which the workers finish, so the
+    caller can consume them without holding all of them. An exception
+    raised for one item is caught in the worker and returned as a
+    BatchFailure in place of the result, so one bad file does not stop
+    the run. The function must be picklable, i.e. defined at module level
+    (or a functools.partial thereof).
+
+    Keyword arguments:
+    function -- callable taking a single item
+    items -- list of items (usually file names)
+    processes -- number of worker processes, None for one per CPU and 1
+        to run everything in the current process
+    chunksize -- number of consecutive items handed to a worker at once
+    callback -- called with (done, total) after each finished item
+    """
+    items = list(items)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(items)))
+
+    if processes == 1:
+        outcomes = (call(function, item) for item in items)
+        futures = []
+        executor = None
+    else:
+        # The chunks are submitted as separate futures, so the pending ones can be cancelled when the caller stops
+        # early (shutdown(cancel_futures=True) needs Python 3.9)
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+        futures = [executor.submit(call_chunk, function, items[start:start + chunksize])
+                   for start in range(0, len(items), chunksize)]
+        outcomes = (outcome for future in futures for outcome in future.result())
+    try:
+        for done, outcome in enumerate(outcomes, 1):
+            if callback is not None:
+                callback(done, len(items))
+            yield outcome
+    finally:
+        for future in futures:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def failures(results):
+    """ Return the BatchFailure entries of a map_files result list """
+    return [result for result in results if isinstance(result, BatchFailure)]
+
+
+def call_chunk(function, items):
+    """ Return the list of call(function, item) of all items """
+    return [call(function, item) for item in items]
+
+
+def call(function, item):
+    """ Return function(item), or a BatchFailure if it raises an exception """
+    try:
+        return function(item)
+    except Exception as e:
+        return BatchFailure(item, repr(e), traceback.format_exc())
@@ -0,0 +1,55 @@
+import io
+import numpy as np
+
+
+def read_text_export(file, dtype, x_col=0, y_col=1, sep="\t"):
+    """Read a (Chromeleon) text export in a single pass.
+
+    This function reads the header of the export line by line, storing
+    every 'key<sep>value' line (e.g. 'File Path' or 'Channel') as
+    metadata, until it reaches the first line that starts with a digit.
+    The column header line directly above the data (e.g. 'Time (min)',
+    'Step (s)', 'Value (EU)') is used to determine the labels and units
+    of the x and y columns. The remainder of the file is then parsed in
+    bulk, converting only the x and y columns (so the 'n.a.' entries of
+    the Step column are never touched).
+
+    Returns a tuple of the structured data array and the metadata dict.
+
+    Keyword arguments:
+    file -- path of the text export
+    dtype -- structured dtype with an 'x' and 'y' field
+    x_col -- index of the time column
+    y_col -- index of the intensity column
+    sep -- column separator
+    """
+    metadata = {}
+    previous = None
+    with open(file, 'r') as fr:
+        for line in fr:
+            if line[0].isdigit():
+                break
+            chunks = line.lstrip('\ufeff').rstrip('\r\n').split(sep)
+            if len(chunks) == 2 and chunks[0] and chunks[0] not in metadata:
+                metadata[chunks[0]] = chunks[1]
+            if line.strip():
+                previous = chunks
+        else:
+            line = ""
+        buffer = line + fr.read()
+
+    if previous is not None and len(previous) > max(x_col, y_col):
+        metadata['x_label'], metadata['x_units'] = _split_units(previous[x_col])
+        metadata['y_label'], metadata['y_units'] = _split_units(previous[y_col])
+
+    data = np.loadtxt(io.StringIO(buffer), delimiter=sep, usecols=(x_col, y_col), dtype=dtype, ndmin=1)
+    return data, metadata
+
+
+def _split_units(label):
+    """ Split a column label like 'Time (min)' into ('Time', 'min') """
+    label = label.strip()
+    if label.endswith(")") and "(" in label:
+        name, units = label[:-1].rsplit("(", 1)
+        return name.strip(), units.strip()
+    return label, ""
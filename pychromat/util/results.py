@@ -0,0 +1,205 @@
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+from .quantitation import RESULT_TYPE
+
+
+class ResultStore(object):
+    """Quantitation results of a batch.
+
+    The results are kept as a single quantitation.RESULT_TYPE array with
+    a row per sample and a column per analyte, alongside the sample
+    names, their calibration formulas and the analyte names. Every output
+    of the summary is a column of this array (or a few vectorized
+    operations on it), so building the summary of a large batch does not
+    involve any parsing. The store is persisted as an (uncompressed) .npz
+    file, which is read back without pickling; its arrays can be memory
+    mapped, so a store on disk can be processed in chunks of samples (see
+    chunks) with a memory use that does not depend on the number of
+    samples.
+
+    Keyword arguments:
+    samples -- list of sample names
+    calibrations -- list of the calibration formula of every sample
+    analytes -- list of analyte names
+    results -- (samples, analytes) RESULT_TYPE array
+    """
+
+    def __init__(self, samples, calibrations, analytes, results):
+        self.samples = np.asarray(samples, dtype=str)
+        self.calibrations = np.asarray(calibrations, dtype=str)
+        self.analytes = np.asarray(analytes, dtype=str)
+        self.results = np.asarray(results, dtype=RESULT_TYPE).reshape(len(self.samples), len(self.analytes))
+
+    @classmethod
+    def from_samples(cls, analytes, samples):
+        """Create a store from the results of the individual samples.
+
+        Keyword arguments:
+        analytes -- list of analyte names
+        samples -- list of (name, calibration formula, RESULT_TYPE array
+            with a row per analyte) tuples
+        """
+        results = np.zeros((len(samples), len(analytes)), dtype=RESULT_TYPE)
+        for index, (_, _, result) in enumerate(samples):
+            results[index] = result
+        return cls([i[0] for i in samples], [i[1] for i in samples], analytes, results)
+
+    @classmethod
+    def load(cls, file, mmap=False):
+        """Read a store written by save.
+
+        Keyword arguments:
+        file -- name of the .npz file
+        mmap -- memory map the arrays instead of reading them into memory
+        """
+        if mmap:
+            return cls(*[_memmap_member(file, name) for name in ('samples', 'calibrations', 'analytes', 'results')])
+        with np.load(file, allow_pickle=False) as data:
+            return cls(data['samples'], data['calibrations'], data['analytes'], data['results'])
+
+    def save(self, file, order=None, size=1024):
+        """Write the store to an (uncompressed) .npz file.
+
+        The results are written in chunks of size samples, so a memory
+        mapped store is not read into memory at once.
+
+        Keyword arguments:
+        file -- name of the .npz file
+        order -- indices of the samples in the order in which they are written, None to keep their order
+        size -- number of samples per chunk
+        """
+        if order is None:
+            order = np.arange(len(self))
+        with zipfile.ZipFile(file, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name, array, rows in (('samples', self.samples, order), ('calibrations', self.calibrations, order),
+                                      ('analytes', self.analytes, np.arange(len(self.analytes))),
+                                      ('results', self.results, order)):
+                header = {'descr': np.lib.format.dtype_to_descr(array.dtype), 'fortran_order': False,
+                          'shape': (len(rows),) + array.shape[1:]}
+                with archive.open(name + ".npy", 'w', force_zip64=True) as fw:
+                    np.lib.format.write_array_header_1_0(fw, header)
+                    for start in range(0, len(rows), size):
+                        fw.write(np.ascontiguousarray(array[rows[start:start + size]]).tobytes())
+
+    def __len__(self):
+        return len(self.samples)
+
+    def chunks(self, size=1024):
+        """ Yield stores of (at most) size consecutive samples, which are views on this store """
+        for start in range(0, len(self), size):
+            yield self.__class__(self.samples[start:start + size], self.calibrations[start:start + size],
+                                 self.analytes, self.results[start:start + size])
+
+    def __getitem__(self, field):
+        """ Return a (samples, analytes) array of a RESULT_TYPE field """
+        return self.results[field]
+
+    def background_subtracted_area(self):
+        """ Return the peak areas minus the background areas, clipped at zero """
+        return np.maximum(self.results['area'] - self.results['backgroundArea'], 0)
+
+    def relative_area(self, background_subtracted=True):
+        """ Return the peak areas relative to the total area of all analytes of the same sample (0 if none) """
+        area = self.background_subtracted_area() if background_subtracted else self.results['area']
+        # Total area of every sample, summed in the order of the analytes
+        total = np.cumsum(area, axis=1)[:, -1:] if area.shape[1] else np.zeros((len(area), 1))
+        relative = np.zeros_like(area)
+        np.divide(area, total, out=relative, where=total != 0)
+        return relative
+
+    def peak_time(self):
+        """ Return the retention time of the fitted Gaussian of every analyte (0 if it could not be fitted) """
+        return np.nan_to_num(self.results['actualTime'], nan=0.)
+
+    def fwhm(self):
+        """ Return the FWHM of the fitted Gaussian of every analyte (0 if it could not be fitted) """
+        return np.nan_to_num(self.results['fwhm'], nan=0.)
+
+    def time_residual(self):
+        """ Return the absolute difference between the fitted and expected retention times """
+        return np.abs(self.peak_time() - self.results['time'])
+
+
+class ResultWriter(object):
+    """Write the results of a batch to a ResultStore on disk, one sample at a time.
+
+    The results of every sample are written to a temporary (memory
+    mapped) .npy file next to the store as soon as they are added, so
+    only the sample names and calibration formulas are kept in memory.
+    close writes the store, with the samples sorted on their name, and
+    discard removes the temporary file of a batch that did not finish.
+
+    Keyword arguments:
+    file -- name of the .npz file of the store
+    analytes -- list of analyte names
+    size -- the maximum number of samples
+    """
+
+    def __init__(self, file, analytes, size):
+        self.file = file
+        self.analytes = list(analytes)
+        self.samples = []
+        self.calibrations = []
+        self.rows_file = file + ".rows.npy"
+        self.rows = np.lib.format.open_memmap(self.rows_file, mode='w+', dtype=RESULT_TYPE,
+                                              shape=(size, len(self.analytes)))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, name, calibration, results):
+        """Write the results of a sample.
+
+        Keyword arguments:
+        name -- sample name
+        calibration -- calibration formula of the sample
+        results -- RESULT_TYPE array with a row per analyte
+        """
+        self.rows[len(self.samples)] = results
+        self.samples.append(name)
+        self.calibrations.append(calibration)
+
+    def close(self):
+        """ Write the store, remove the temporary file and return the store, memory mapped from file """
+        store = ResultStore(self.samples, self.calibrations, self.analytes, self.rows[:len(self.samples)])
+        store.save(self.file, order=np.argsort(store.samples, kind='stable'))
+        del store
+        self.discard()
+        return ResultStore.load(self.file, mmap=True)
+
+    def discard(self):
+        """ Remove the temporary file without writing the store, does nothing after close """
+        if self.rows is not None:
+            self.rows = None
+            os.remove(self.rows_file)
+
+
+def _memmap_member(file, name):
+    """Memory map an array of an uncompressed .npz file.
+
+    The .npy data of a stored (uncompressed) zip member is contiguous in
+    the .npz file, it starts after the local header of the member and
+    the .npy header. A compressed member is read into memory instead.
+    """
+    with zipfile.ZipFile(file) as archive:
+        info = archive.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        with np.load(file, allow_pickle=False) as data:
+            return data[name]
+    with open(file, 'rb') as fr:
+        fr.seek(info.header_offset)
+        header = struct.unpack('<4s5H3I2H', fr.read(30))
+        fr.seek(info.header_offset + 30 + header[9] + header[10])
+        version = np.lib.format.read_magic(fr)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fr)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fr)
+        offset = fr.tell()
+    if not np.prod(shape, dtype=np.int64):
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(file, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
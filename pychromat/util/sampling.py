@@ -0,0 +1,129 @@
+import math
+import numpy as np
+import scipy.interpolate
+
+
+def resample(x, points_per_step=4, peak_width=None, points_per_width=50):
+    """Return a resampling grid suited to the sampling of the data.
+
+    Every sampling step of the original data is divided into
+    points_per_step equal parts, so the grid contains the original time
+    points and follows any irregular sampling. When the expected peak
+    width is known, an evenly spaced grid is returned instead, with at
+    least points_per_width points per peak width and at least
+    points_per_step points per (median) sampling step. Resampling a
+    spline through the data any finer than this only repeats the spline
+    between the original data points.
+
+    Keyword arguments:
+    x -- sorted array of times of the original data
+    points_per_step -- number of grid points per original sampling step
+    peak_width -- expected width of a peak (same unit as x) or None
+    points_per_width -- minimum number of grid points per peak width
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) < 2:
+        return x.copy()
+    steps = np.diff(x)
+    if peak_width:
+        density = max(points_per_width / float(peak_width), points_per_step / np.median(steps))
+        return np.linspace(x[0], x[-1], int(density * (x[-1] - x[0])))
+    fractions = np.arange(points_per_step) / float(points_per_step)
+    grid = (x[:-1, None] + steps[:, None] * fractions[None, :]).ravel()
+    return np.append(grid, x[-1])
+
+
+def spline_roots(spline, nu=1):
+    """Return the points where a derivative of a spline changes sign.
+
+    The spline is converted to its piecewise polynomial representation,
+    whose derivative is solved analytically per interval between the
+    knots. This is exact and O(number of knots), without evaluating the
+    spline on a dense grid. Roots where the derivative only touches zero
+    are ignored.
+
+    Returns the sorted roots and the sign of the derivative after each
+    root, i.e. -1 for a local maximum and 1 for a local minimum of
+    derivative nu - 1.
+
+    Keyword arguments:
+    spline -- scipy.interpolate.UnivariateSpline (e.g. InterpolatedUnivariateSpline)
+    nu -- order of the derivative, 1 for the extrema and 2 for the
+        inflection points of the spline
+    """
+    ppoly = scipy.interpolate.PPoly.from_spline(_tck(spline)).derivative(nu)
+    x0, x1 = ppoly.x[0], ppoly.x[-1]
+    roots = ppoly.roots(extrapolate=False)
+    roots = np.unique(roots[np.isfinite(roots) & (roots > x0) & (roots < x1)])
+
+    # The sign between consecutive roots determines which roots are crossings
+    edges = np.concatenate(([x0], roots, [x1]))
+    signs = np.sign(ppoly(0.5 * (edges[:-1] + edges[1:])))
+    crossing = (signs[:-1] * signs[1:]) < 0
+    return roots[crossing], signs[1:][crossing]
+
+
+def _tck(spline):
+    """Return the (t, c, k) tuple of a UnivariateSpline from its public knots and coefficients.
+
+    get_knots only returns the distinct knots, the full knot vector
+    repeats both boundary knots k more times, which also gives the degree
+    k = len(coefficients) - len(knots) + 1.
+    """
+    knots, coefficients = spline.get_knots(), spline.get_coeffs()
+    k = len(coefficients) - len(knots) + 1
+    t = np.concatenate((np.repeat(knots[0], k), knots, np.repeat(knots[-1], k)))
+    return t, coefficients, k
+
+
+def inflection_points(spline):
+    """ Return the sorted inflection points (the extrema of the first derivative) of a spline """
+    return spline_roots(spline, 2)[0]
+
+
+def grid_extrema(spline, grid, nu=2):
+    """Return the indices of the grid points at the extrema of a derivative of a spline.
+
+    These are the grid points where derivative nu - 1 of the spline is
+    larger (or smaller) than at both neighbouring grid points, i.e. the
+    local extrema of that derivative sampled on the grid (as found by
+    scipy.signal.argrelextrema). Every such grid point neighbours a root
+    of derivative nu (see spline_roots), so only the grid points around
+    those roots are evaluated. Extrema that lie too close together to
+    show up on the grid do not have a grid point of their own.
+
+    Keyword arguments:
+    spline -- scipy.interpolate.UnivariateSpline (e.g. InterpolatedUnivariateSpline)
+    grid -- sorted array of points
+    nu -- order of the derivative, 2 for the extrema of the first derivative
+    """
+    grid = np.asarray(grid, dtype=np.float64)
+    roots, signs = spline_roots(spline, nu)
+    positions = np.searchsorted(grid, roots)
+    candidates = np.concatenate((positions - 1, positions))
+    maximum = np.concatenate((signs, signs)) < 0
+    inside = (candidates >= 1) & (candidates <= len(grid) - 2)
+    candidates, maximum = candidates[inside], maximum[inside]
+
+    derivative = spline.derivative(nu - 1) if nu > 1 else spline
+    value, before, after = [derivative(grid[candidates + offset]) for offset in (0, -1, 1)]
+    extremum = np.where(maximum, (value > before) & (value > after), (value < before) & (value < after))
+    return np.unique(candidates[extremum])
+
+
+def insert_points(grid, points):
+    """Insert points into a sorted grid.
+
+    Returns the new grid and the indices of the points in it; a point
+    that is already part of the grid is not inserted again.
+
+    Keyword arguments:
+    grid -- sorted array
+    points -- sorted array of points within the range of the grid
+    """
+    grid = np.asarray(grid, dtype=np.float64)
+    points = np.asarray(points, dtype=np.float64)
+    positions = np.searchsorted(grid, points)
+    insert = grid[np.minimum(positions, len(grid) - 1)] != points
+    preceding = np.cumsum(insert) - insert
+    return np.insert(grid, positions[insert], points[insert]), positions + preceding
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class MaxSegmentTree(object):
+    """Maximum of an array that is updated in place, one range at a time.
+
+    The tree keeps the maximum of every pair of nodes, with the data in
+    the leaves, so the maximum and its location are found in O(log n) and
+    updating a range of k values costs O(k + log n), independent of the
+    length of the array.
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.length = len(values)
+        self.size = 1
+        while self.size < max(self.length, 1):
+            self.size *= 2
+        self.tree = np.full(2 * self.size, -np.inf)
+        self.tree[self.size:self.size + self.length] = values
+        for level_start in self._levels():
+            self._rebuild(level_start, 2 * level_start - 1)
+
+    def _levels(self):
+        level_start = self.size // 2
+        while level_start >= 1:
+            yield level_start
+            level_start //= 2
+
+    def _rebuild(self, low, high):
+        """ Recompute the parents low to high (inclusive) from their children """
+        children = self.tree[2 * low:2 * high + 2]
+        self.tree[low:high + 1] = np.maximum(children[0::2], children[1::2])
+
+    def update(self, low, values):
+        """ Replace the values starting at index low and update their parents """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        low += self.size
+        high = low + len(values) - 1
+        self.tree[low:high + 1] = values
+        while low > 1:
+            low //= 2
+            high //= 2
+            self._rebuild(low, high)
+
+    def max(self):
+        """ Return the maximum of all values """
+        return self.tree[1]
+
+    def argmax(self):
+        """ Return the index of the (first) maximum """
+        node = 1
+        while node < self.size:
+            node *= 2
+            if self.tree[node] < self.tree[node + 1]:
+                node += 1
+        return node - self.size
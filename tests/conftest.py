@@ -0,0 +1,68 @@
+import glob
+import os
+import sys
+
+import pytest
+
+# The modules of the package import each other as top-level modules (e.g. 'import util')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "pychromat"))
+
+EXAMPLE_FOLDER = os.path.join(os.path.dirname(__file__), os.pardir, "example")
+CALIBRANTS = os.path.join(EXAMPLE_FOLDER, "20180516 IgG1_Calibrants.ref")
+ANALYTES = os.path.join(EXAMPLE_FOLDER, "20180516 IgG1_Analytes.ref")
+
+
+@pytest.fixture(scope="session")
+def example_files():
+    """ The example chromatograms """
+    return sorted(glob.glob(os.path.join(EXAMPLE_FOLDER, "*ChA.txt")))
+
+
+@pytest.fixture(scope="session")
+def calibrant_file():
+    return CALIBRANTS
+
+
+@pytest.fixture(scope="session")
+def analyte_file():
+    return ANALYTES
+
+
+@pytest.fixture(scope="session")
+def settings():
+    import batch
+    return batch.BatchSettings()
+
+
+@pytest.fixture(scope="session")
+def traces(example_files, settings):
+    """ The baseline corrected example chromatograms, as in the batch process """
+    from Trace import Trace
+    return [Trace.from_file(file).correct_baseline(settings.points, settings.baselineOrder) for file in example_files]
+
+
+@pytest.fixture(scope="session")
+def background_windows(traces, settings):
+    """ The intensities of the background windows of all analytes in all example chromatograms """
+    import batch
+    from util import quantitation
+    peaks = batch.get_peak_list(ANALYTES, settings)
+    windows = []
+    for trace in traces:
+        rows = quantitation.windows(trace.x, [i[1] for i in peaks], [i[2] for i in peaks], settings.backgroundWindow,
+                                    settings.start, settings.end)
+        windows.extend(trace.y[row['lowBackground']:row['highBackground']] for row in rows)
+    return windows
+
+
+@pytest.fixture(scope="session")
+def calibrant_sets(traces, settings):
+    """ The (measured, expected) calibrant times of every example chromatogram """
+    import numpy as np
+    import batch
+    refPeaks = batch.get_peak_list(CALIBRANTS, settings)
+    sets = []
+    for trace in traces:
+        expected, measured = zip(*batch.determineTimepairs(refPeaks, trace, settings))
+        sets.append((np.array(measured), np.array(expected), trace.x[0], trace.x[-1]))
+    return sets
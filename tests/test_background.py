@@ -0,0 +1,124 @@
+import math
+import sys
+
+import numpy as np
+import pytest
+
+import util
+
+
+def loop_background_noise(y, slice_points=5, noise_method="RMS"):
+    """ The original segment loop of Trace.background_noise """
+    background = sys.maxsize
+    noise = 0
+    for index in range(len(y) - slice_points):
+        segment = y[index:(index + slice_points)]
+
+        if np.mean(segment) < background:
+            background = np.mean(segment)
+
+            if noise_method == "MM":
+                noise = max(segment) - min(segment)
+            elif noise_method == "RMS":
+                noise = np.std(segment)
+    if noise == 0:
+        noise = 1
+    return background, noise
+
+
+def loop_noban(data, noban_start=0.25, noise_method="RMS"):
+    """ The original NOBAN loop, growing or shrinking the region in steps of 10%, 5% or a single point """
+
+    def calc_values(sorted_data, curr_size):
+        curr_average = np.average(sorted_data[0:curr_size])
+        if noise_method == "MM":
+            curr_noise = max(sorted_data[0:curr_size]) - min(sorted_data[0:curr_size])
+        else:
+            curr_noise = np.std(sorted_data[0:curr_size])
+        return curr_average, curr_noise
+
+    sorted_data = sorted(data)
+    start_size = int(noban_start * float(len(sorted_data)))
+    curr_size = start_size
+    curr_average, curr_noise = calc_values(sorted_data, curr_size)
+    for k in range(0, len(sorted_data) - (start_size + 1)):
+        remainder = len(sorted_data) - curr_size
+        large_step = int(math.ceil(0.1 * remainder))
+        small_step = int(math.ceil(0.05 * remainder))
+        threshold = curr_average + 3 * curr_noise
+        try:
+            if sorted_data[curr_size + large_step] < threshold:
+                curr_size += large_step
+            elif sorted_data[curr_size + small_step] < threshold:
+                curr_size += small_step
+            elif sorted_data[curr_size + 1] < threshold:
+                curr_size += 1
+            elif sorted_data[curr_size - large_step] > threshold:
+                curr_size -= large_step
+            elif sorted_data[curr_size - small_step] > threshold:
+                curr_size -= small_step
+            elif sorted_data[curr_size - 1] > threshold:
+                curr_size -= 1
+            else:
+                break
+        except IndexError:
+            break
+        curr_average, curr_noise = calc_values(sorted_data, curr_size)
+    if curr_noise == 0:
+        curr_noise = 1
+    return {'Background': curr_average, 'Noise': curr_noise}
+
+
+@pytest.mark.parametrize("noise_method", ["RMS", "MM"])
+def test_background_noise_matches_loop(background_windows, noise_method):
+    for y in background_windows:
+        assert util.background_noise(y, 5, noise_method) == pytest.approx(loop_background_noise(y, 5, noise_method),
+                                                                          rel=1e-12)
+
+
+@pytest.mark.parametrize("noise_method", ["RMS", "MM"])
+def test_background_noise_from_shared_profile(traces, noise_method):
+    # The windows of the first chromatogram searched in the profile of the complete chromatogram
+    profile = util.BackgroundProfile()
+    y = traces[0].y
+    for low, high in ((0, 1000), (2000, 2600), (len(y) - 300, len(y))):
+        result = profile.get(y, low, high, "MT", noise_method)
+        expected = loop_background_noise(y[low:high], 5, noise_method)
+        assert (result['Background'], result['Noise']) == pytest.approx(expected, rel=1e-12)
+    # The profile is computed once, for every number of slice points
+    assert (profile.windows, len(profile.profiles), profile.reuses) == (3, 1, 2)
+    profile.get(y, 0, 1000, "MT", noise_method, slice_points=10)
+    profile.get(y, 0, 1000, "NOBAN", noise_method)
+    assert (profile.windows, len(profile.profiles), profile.reuses) == (5, 2, 2)
+
+
+def test_rolling_profile_matches_segments(traces):
+    y = traces[0].y[:2000]
+    profile = util.rolling_background_noise(y, 5)
+    segments = y[np.arange(len(y) - 4)[:, None] + np.arange(5)]
+    assert len(profile) == len(segments)
+    np.testing.assert_allclose(profile['background'], segments.mean(axis=1), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(profile['rms'], segments.std(axis=1), rtol=1e-7, atol=1e-9)
+    np.testing.assert_array_equal(profile['mm'], segments.max(axis=1) - segments.min(axis=1))
+
+
+def test_background_noise_short_signal():
+    assert util.background_noise([1., 2., 3.], 5) == loop_background_noise([1., 2., 3.], 5)
+
+
+@pytest.mark.parametrize("noise_method", ["RMS", "MM"])
+def test_noban_matches_loop(background_windows, noise_method):
+    for y in background_windows:
+        result, expected = util.noban(y, 0.25, noise_method), loop_noban(y, 0.25, noise_method)
+        assert (result['Background'], result['Noise']) == pytest.approx(
+            (expected['Background'], expected['Noise']), rel=1e-9, abs=1e-12)
+
+
+def test_noban_with_signal():
+    # A flat background with a few (> 3 SD) peaks, the region must stop below the peaks
+    y = np.concatenate((np.random.RandomState(0).normal(1., 0.1, 500), [5., 6., 7., 8.]))
+    result = util.noban(y)
+    expected = loop_noban(y)
+    assert (result['Background'], result['Noise']) == pytest.approx((expected['Background'], expected['Noise']),
+                                                                    rel=1e-12)
+    assert result['Background'] < 1.1
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pytest
+
+from util import cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "cache"
+    monkeypatch.setattr(cache, "cache_dir", str(directory))
+    return directory
+
+
+def raw_file(tmp_path, name="raw.txt", content="1.0 2.0\n"):
+    file = tmp_path / name
+    file.write_text(content)
+    return str(file)
+
+
+def test_store_and_load(tmp_path):
+    file = raw_file(tmp_path)
+    data = np.arange(10, dtype=np.float64)
+    assert cache.load(file) is None
+    cache.store(file, data, {'Name': "raw"})
+    loaded, metadata = cache.load(file)
+    assert isinstance(loaded, np.memmap) and not loaded.flags.writeable
+    np.testing.assert_array_equal(loaded, data)
+    assert metadata == {'Name': "raw"}
+
+
+def test_key_changes_with_file(tmp_path):
+    file = raw_file(tmp_path)
+    key = cache.cache_key(file)
+    assert cache.cache_key(file) == key
+    stat = os.stat(file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.cache_key(file) != key
+    key = cache.cache_key(file)
+    with open(file, 'a') as fa:
+        fa.write("3.0 4.0\n")
+    assert cache.cache_key(file) != key
+
+
+def test_format_version_misses(tmp_path, monkeypatch):
+    file = raw_file(tmp_path)
+    cache.store(file, np.ones(3))
+    assert cache.load(file) is not None
+    monkeypatch.setattr(cache, "FORMAT_VERSION", cache.FORMAT_VERSION + 1)
+    assert cache.load(file) is None
+
+
+def test_failed_write_leaves_no_partial_entry(tmp_path, cache_dir, monkeypatch):
+    file = raw_file(tmp_path)
+
+    def failing_save(fw, data):
+        fw.write(b"\x93NUMPY partial")
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(np, "save", failing_save)
+    cache.store(file, np.ones(3))
+    assert not [name for name in os.listdir(str(cache_dir)) if name.endswith((".npy", ".tmp"))]
+    assert cache.load(file) is None
+
+
+def test_eviction_keeps_recent_entries(tmp_path, cache_dir, monkeypatch):
+    files = [raw_file(tmp_path, "raw%d.txt" % i) for i in range(5)]
+    data = np.zeros(1000)
+    for index, file in enumerate(files):
+        cache.store(file, data)
+        # Distinct access times, the oldest entry is used least recently
+        os.utime(os.path.join(str(cache_dir), cache.cache_key(file) + ".npy"), (index, index))
+    size = os.path.getsize(os.path.join(str(cache_dir), cache.cache_key(files[0]) + ".npy"))
+    monkeypatch.setattr(cache, "max_size", 3 * size)
+    # Loading marks the first entry as recently used
+    assert cache.load(files[0]) is not None
+    cache.evict()
+    entries = [name for name in os.listdir(str(cache_dir)) if name.endswith(".npy")]
+    assert sum(os.path.getsize(os.path.join(str(cache_dir), name)) for name in entries) <= cache.max_size
+    assert [cache.load(file) is not None for file in files] == [True, False, False, True, True]
+    assert len(os.listdir(str(cache_dir))) == 2 * 3
+    cache.clear()
+    assert not os.listdir(str(cache_dir))
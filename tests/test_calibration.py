@@ -0,0 +1,183 @@
+import math
+import sys
+import warnings
+
+import numpy as np
+import pytest
+import scipy.interpolate
+import scipy.optimize
+
+import util
+from util import calibration
+
+
+def loop_calibration(measured, expected, minimum, maximum, min_improvement=0.05, use_interpolation=False):
+    """ The original ultraPerformanceCalibration, with the penalty power law fit, returns the function and RMS """
+    RMS = sys.maxsize
+    func = None
+
+    # Polynomials between 1 and len(expected)
+    for i in range(1, len(expected)):
+        z = np.polyfit(measured, expected, i)
+        f = np.poly1d(z)
+
+        # Check if the fitted polynomial is monotone
+        X_range = np.linspace(minimum, maximum, 10000)
+        dx = np.diff(f(X_range))
+        if not np.all(dx > 0):
+            break
+
+        # Calculate RMS
+        RMS_buffer = math.sqrt(np.mean([(f(j) - expected[index]) ** 2 for index, j in enumerate(measured)]))
+        if RMS_buffer < RMS - min_improvement * RMS:
+            RMS = RMS_buffer
+            func = f
+
+    # Power Law, check if the fitted function is monotone
+    z = penalty_fit(measured, expected)
+    if np.all(np.diff(util.power_law(np.linspace(minimum, maximum, 10000), *z)) > 0):
+        RMS_buffer = math.sqrt(np.mean([(util.power_law(i, *z) - expected[index]) ** 2
+                                        for index, i in enumerate(measured)]))
+        if RMS_buffer < RMS - min_improvement * RMS:
+            RMS = RMS_buffer
+            func = util.PowerLawCall(*z)
+
+    if use_interpolation:
+        for f in (scipy.interpolate.PchipInterpolator(measured, expected),
+                  scipy.interpolate.Akima1DInterpolator(measured, expected)):
+            RMS_buffer = math.sqrt(np.mean([(f(j) - expected[index]) ** 2 for index, j in enumerate(measured)]))
+            if RMS_buffer < RMS - min_improvement * RMS:
+                RMS = RMS_buffer
+                func = f
+
+    return func, RMS
+
+
+def penalty_fit(measured, expected):
+    """ The original curve_fit of the penalised util.power_law, raises a RuntimeError if it failed """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return scipy.optimize.curve_fit(util.power_law, measured, expected)[0]
+
+
+def jittered(calibrant_sets, count=5, jitter=0.05):
+    """ The calibrant sets and copies of them with jittered measured times """
+    random = np.random.RandomState(0)
+    for measured, expected, minimum, maximum in calibrant_sets:
+        yield measured, expected, minimum, maximum
+        for _ in range(count):
+            yield np.sort(measured + random.normal(0, jitter, len(measured))), expected, minimum, maximum
+
+
+@pytest.mark.parametrize("use_interpolation", [False, True])
+def test_select_model_matches_loop(calibrant_sets, use_interpolation):
+    for measured, expected, minimum, maximum in jittered(calibrant_sets):
+        selected = calibration.select_model(measured, expected, minimum, maximum, 0.05, use_interpolation)
+        try:
+            function, rms = loop_calibration(measured, expected, minimum, maximum, 0.05, use_interpolation)
+        except RuntimeError:
+            # The original had no result when the power law fit failed
+            continue
+        assert type(selected['Function']) is type(function)
+        assert selected['RMS'] == pytest.approx(rms, rel=1e-6, abs=1e-9)
+        # The power law fits converge to within their tolerance, the other models are exact
+        tolerance = 1e-4 if isinstance(function, util.PowerLawCall) else 1e-9
+        np.testing.assert_allclose(selected['Function'](measured), function(measured), atol=tolerance)
+        if isinstance(function, np.poly1d):
+            assert selected['Model'] == "Polynomial " + str(function.order)
+        assert calibration.ultraPerformanceCalibration(measured, expected, minimum, maximum, 0.05,
+                                                       use_interpolation) is not None
+
+
+def test_select_model_stops_at_non_monotone_polynomial():
+    # A cubic with a local maximum inside [minimum, maximum]
+    measured = np.linspace(1., 9., 6)
+    expected = (measured - 5.) ** 3 - 12. * measured
+    selected = calibration.select_model(measured, expected, 1., 9.)
+    models = [candidate['Model'] for candidate in selected['Candidates']]
+    assert models[0] == "Polynomial 1" and "Polynomial 4" not in models
+    assert not selected['Candidates'][-2]['Monotone']
+    # The original loop stops at the same degree, judged on a dense grid
+    for candidate in selected['Candidates'][:-1]:
+        f = np.poly1d(np.polyfit(measured, expected, int(candidate['Model'].split()[1])))
+        assert candidate['Monotone'] == bool(np.all(np.diff(f(np.linspace(1., 9., 10000))) > 0))
+
+
+def penalty_rms(parameters, measured, expected):
+    return math.sqrt(np.mean((util.power_law(measured, *parameters) - expected) ** 2))
+
+
+def test_power_law_matches_penalty_fit(calibrant_sets):
+    for measured, expected, _, _ in calibrant_sets:
+        f = util.fit_power_law(measured, expected)
+        parameters = penalty_fit(measured, expected)
+        assert f.success
+        assert f.rms == pytest.approx(penalty_rms(parameters, measured, expected), rel=1e-6)
+        assert f.rms == pytest.approx(math.sqrt(np.mean((f(measured) - expected) ** 2)), rel=1e-9)
+        np.testing.assert_allclose((f.a, f.b, f.c), parameters, rtol=1e-4, atol=1e-4)
+
+
+def test_power_law_at_least_as_good_as_penalty_fit(calibrant_sets):
+    for measured, expected, _, _ in jittered(calibrant_sets, count=20):
+        f = util.fit_power_law(measured, expected)
+        assert f.success and 0 <= f.b <= 2
+        try:
+            parameters = penalty_fit(measured, expected)
+        except RuntimeError:
+            continue
+        if 0 <= parameters[1] <= 2:
+            assert f.rms <= penalty_rms(parameters, measured, expected) * (1 + 1e-6)
+
+
+def test_power_law_exponent_bounds():
+    # An exponent outside the bounds ends up at the nearest bound
+    x = np.linspace(1., 10., 8)
+    f = util.fit_power_law(x, 2. * x ** 3 + 1.)
+    assert f.success and f.b == 2.
+    f = util.fit_power_law(x, 1. / x)
+    assert f.success and f.b == pytest.approx(0., abs=1e-6)
+
+
+def test_apply_matches_function(calibrant_sets, traces):
+    time = traces[0].x
+    for measured, expected, minimum, maximum in calibrant_sets:
+        for function in (np.poly1d(np.polyfit(measured, expected, 2)), util.fit_power_law(measured, expected),
+                         scipy.interpolate.PchipInterpolator(measured, expected)):
+            calibrated = calibration.apply(function, time)
+            assert isinstance(calibrated, np.ndarray) and calibrated.dtype == np.float64
+            np.testing.assert_allclose(calibrated, [function(t) for t in time], rtol=1e-12)
+
+
+def test_warm_start_matches_cold_start(calibrant_sets):
+    warm_start = calibration.WarmStart()
+    for measured, expected, minimum, maximum in calibrant_sets:
+        warm = warm_start.select(measured, expected, minimum, maximum)
+        cold = calibration.select_model(measured, expected, minimum, maximum)
+        assert warm['Model'] == cold['Model']
+        assert warm['RMS'] == pytest.approx(cold['RMS'], rel=1e-9)
+        time = np.linspace(minimum, maximum, 1000)
+        np.testing.assert_allclose(warm['Function'](time), cold['Function'](time), atol=1e-9)
+    # The example chromatograms share a calibration model, so most of them reuse it
+    assert warm_start.fast >= len(calibrant_sets) // 2
+    assert warm_start.fast + warm_start.searches == len(calibrant_sets)
+
+
+def test_warm_start_falls_back_to_select_model():
+    warm_start = calibration.WarmStart()
+    measured = np.linspace(10., 30., 30)
+    noise = np.random.RandomState(0).normal(0., 0.01, len(measured))
+    first = warm_start.select(measured, 1.1 * measured + 0.5 + noise, 0., 40.)
+    assert not first['FastPath']
+    # A slightly different line reuses the model
+    assert warm_start.select(measured, 1.09 * measured + 0.6 + noise, 0., 40.)['FastPath']
+    # The residual of the model of a line fitted to exponential data exceeds the threshold
+    expected = np.exp(measured / 4.) + noise
+    assert calibration.refit_model(first, measured, expected, 0., 40.)['RMS'] > first['RMS'] * 1.05
+    selected = warm_start.select(measured, expected, 0., 40.)
+    cold = calibration.select_model(measured, expected, 0., 40.)
+    assert not selected['FastPath'] and selected['Model'] == cold['Model']
+    assert selected['RMS'] == cold['RMS']
+    assert (warm_start.fast, warm_start.searches) == (1, 2)
+    # The new model is reused from then on
+    reused = warm_start.select(measured, expected + noise / 2, 0., 40.)
+    assert reused['FastPath'] and reused['Model'] == cold['Model']
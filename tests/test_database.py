@@ -0,0 +1,71 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import batch
+import util
+from util.quantitation import RESULT_TYPE
+
+
+def example_store(samples, analytes=("G0F", "G1F"), offset=0.):
+    results = np.zeros((len(samples), len(analytes)), dtype=RESULT_TYPE)
+    for index, field in enumerate(RESULT_TYPE.names):
+        results[field] = np.arange(results.size).reshape(results.shape) + index + offset
+    results['residual'][0, 0] = np.nan
+    return util.ResultStore(list(samples), ["%d*X^1+0" % i for i in range(len(samples))], list(analytes), results)
+
+
+@pytest.fixture
+def database():
+    with util.ResultsDatabase(":memory:") as database:
+        yield database
+
+
+def test_database_round_trip(database, tmp_path):
+    settings = batch.BatchSettings()
+    first = example_store(["a", "b"])
+    batch_id = database.add_batch(first, settings, tmp_path / "first", datetime(2020, 1, 1), "1.0")
+    area = first['area'][:, 1].tolist()
+    assert database.trend("G1F") == [("2020-01-01T00:00:00", str(tmp_path / "first"), "a", area[0]),
+                                     ("2020-01-01T00:00:00", str(tmp_path / "first"), "b", area[1])]
+    assert database.trend("G0F", "residual")[0][3] is None
+    stored = dict(database.connection.execute("SELECT name, value FROM settings WHERE batch = ?", (batch_id,)))
+    assert stored == {name: str(value) for name, value in vars(settings).items()}
+
+    # A second batch, and a re-run of the first that replaces sample b and adds sample c
+    database.add_batch(example_store(["a"], offset=100.), settings, tmp_path / "second", datetime(2020, 1, 2))
+    rerun = database.add_batch(example_store(["b", "c"], offset=10.), settings, tmp_path / "first",
+                               datetime(2020, 1, 3))
+    assert rerun == batch_id
+    assert [(os.path.basename(row[1]), row[2], row[3]) for row in database.trend("G1F")] == [
+        ("first", "a", area[0]), ("second", "a", area[0] + 100), ("first", "b", area[0] + 10),
+        ("first", "c", area[1] + 10)]
+    assert database.connection.execute("SELECT COUNT(*) FROM analytes").fetchone()[0] == 8
+    assert database.connection.execute("SELECT COUNT(*) FROM calibrations").fetchone()[0] == 4
+    assert [row[2] for row in database.trend("G1F", start="2020-01-02", end=datetime(2020, 1, 2, 12))] == ["a"]
+    with pytest.raises(ValueError):
+        database.trend("G1F", "unknown")
+
+
+def test_database_rolls_back(database, tmp_path):
+    store = example_store(["a", "a"])
+    with pytest.raises(sqlite3.IntegrityError):
+        database.add_batch(store, batch.BatchSettings(), tmp_path)
+    for table in ("batches", "settings", "samples", "analytes"):
+        assert database.connection.execute("SELECT COUNT(*) FROM %s" % table).fetchone()[0] == 0
+
+
+def test_database_analyzes_on_growth(database, tmp_path):
+    statements = []
+    database.connection.set_trace_callback(statements.append)
+    settings = batch.BatchSettings()
+    database.add_batch(example_store(["a", "b"]), settings, tmp_path / "first")
+    assert statements.count("ANALYZE") == 1
+    # Replacing the same samples does not change the number of analytes
+    database.add_batch(example_store(["a", "b"]), settings, tmp_path / "first")
+    assert statements.count("ANALYZE") == 1
+    database.add_batch(example_store(["s%d" % i for i in range(10)]), settings, tmp_path / "second")
+    assert statements.count("ANALYZE") == 2
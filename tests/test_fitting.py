@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import util
+
+
+@pytest.mark.parametrize("p", [(1., 5., 0.2), (250., 17.3, 0.05), (0.01, -2., 3.)])
+def test_caruana_guess_noiseless(p):
+    x = np.linspace(p[1] - 3 * p[2], p[1] + 4 * p[2], 50)
+    assert util.caruana_guess(x, util.gauss_function(x, *p)) == pytest.approx(p, rel=1e-9)
+
+
+def test_caruana_guess_without_peak():
+    x = np.linspace(0., 1., 20)
+    assert util.caruana_guess(x, np.exp(x)) is None
+    assert util.caruana_guess(x[:2], [1., 2.]) is None
+
+
+@pytest.mark.parametrize("p", [(1., 5., 0.2), (3., 4.8, 0.5)])
+def test_gauss_jacobian_matches_finite_differences(p):
+    x = np.linspace(4., 6., 41)
+    jacobian = util.gauss_jacobian(x, *p)
+    assert jacobian.shape == (len(x), 3)
+    for column, step in enumerate(np.eye(3) * 1e-6):
+        difference = (util.gauss_function(x, *(p + step)) - util.gauss_function(x, *(p - step))) / 2e-6
+        np.testing.assert_allclose(jacobian[:, column], difference, rtol=1e-6, atol=1e-8)
+
+
+@pytest.mark.parametrize("timeout", [None, 10.])
+def test_fit_gaussian(timeout):
+    p = (2., 5., 0.2)
+    x = np.linspace(4., 6., 101)
+    y = util.gauss_function(x, *p) + np.random.RandomState(0).normal(0., 0.01, len(x))
+    assert util.fit_gaussian(x, y, timeout=timeout) == pytest.approx(p, rel=1e-2)
+    assert util.fit_gaussian(x, y, (1., 5.1, 0.3), timeout=timeout) == pytest.approx(p, rel=1e-2)
+
+
+@pytest.mark.parametrize("timeout", [None, 10.])
+@pytest.mark.parametrize("points", [0, 1, 2])
+def test_fit_gaussian_too_few_points(timeout, points):
+    x = np.linspace(4., 6., points)
+    with pytest.raises(TypeError):
+        util.fit_gaussian(x, np.ones(points), timeout=timeout)
+    with pytest.raises(TypeError):
+        util.fit_gaussian(x, np.ones(points), (1., 5., 0.2), timeout=timeout)
+
+
+def test_fit_gaussian_timeout():
+    x = np.linspace(4., 6., 101)
+    with pytest.raises(util.FitTimeout):
+        util.fit_gaussian(x, util.gauss_function(x, 2., 5., 0.2), timeout=-1.)
+    # A FitTimeout is a RuntimeError, like the failures of curve_fit
+    assert issubclass(util.FitTimeout, RuntimeError)
@@ -0,0 +1,46 @@
+import math
+import shutil
+
+import numpy as np
+import pytest
+
+import batch
+from util import parallel
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_map_files_keeps_order_and_failures(processes):
+    progress = []
+    results = parallel.map_files(math.sqrt, [16., -1., 9., 4.], processes=processes,
+                                 callback=lambda done, total: progress.append((done, total)))
+    assert [results[0], results[2], results[3]] == [4., 3., 2.]
+    assert isinstance(results[1], parallel.BatchFailure)
+    assert results[1].item == -1. and "ValueError" in results[1].error
+    assert parallel.failures(results) == [results[1]]
+    assert progress == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+
+def test_map_files_without_items():
+    assert parallel.map_files(math.sqrt, [], processes=2) == []
+
+
+def test_batch_independent_of_processes(tmp_path, example_files, calibrant_file, analyte_file):
+    stores = []
+    for processes in (1, 2):
+        folder = tmp_path / str(processes)
+        folder.mkdir()
+        for file in example_files:
+            shutil.copy(file, str(folder))
+        result = batch.run(str(folder), calibrant_file, analyte_file, batch.BatchSettings(processes=processes))
+        assert not result['Failures']
+        stores.append(result['Results'])
+    assert len(stores[0]) == len(example_files)
+    np.testing.assert_array_equal(stores[0].samples, stores[1].samples)
+    np.testing.assert_array_equal(stores[0].results, stores[1].results)
+
+
+def test_imap_files_stops_early():
+    outcomes = parallel.imap_files(math.sqrt, [16., 9., 4., 1.] * 10, processes=2, chunksize=3)
+    assert next(outcomes) == 4.
+    # Closing the generator cancels the pending chunks and shuts the pool down
+    outcomes.close()
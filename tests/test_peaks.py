@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from Trace import Trace
+
+# The peaks in the 10 - 30 minute window of the first (uncalibrated) example chromatogram, the eight analytes
+# of the reference file and the peak at 10.82 minutes
+WINDOW_PEAKS = [10.82, 16.35, 17.29, 18.66, 19.18, 19.46, 21.73, 22.77, 24.82]
+
+
+@pytest.fixture
+def trace(example_files, settings):
+    return Trace.from_file(example_files[0], use_cache=False).correct_baseline(settings.points, settings.baselineOrder)
+
+
+def peak_positions(functions):
+    return [float(function['Peak']) for function in functions]
+
+
+def test_detect_peaks_fast(trace):
+    positions = peak_positions(trace.window(10, 30).detect_peaks(method="fast"))
+    assert positions == pytest.approx(WINDOW_PEAKS, abs=0.01)
+    # Only the peaks, not the noise, of the complete chromatogram
+    assert len(trace.detect_peaks(method="fast")) < 30
+
+
+def test_detect_peaks_cluster(trace, tmp_path):
+    output = tmp_path / "annotation.ref"
+    functions = trace.window(10, 30).detect_peaks(method="cluster", output=str(output))
+    assert peak_positions(functions) == pytest.approx(WINDOW_PEAKS, abs=0.01)
+    lines = output.read_text().splitlines()
+    assert lines[0] == "Peak\tRT\tWindow" and len(lines) == len(WINDOW_PEAKS) + 1
+    assert [line.split("\t")[0] for line in lines[1:]] == ["%.2f" % peak for peak in peak_positions(functions)]
+
+
+def test_detect_peaks_without_output(trace, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    trace.window(10, 30).detect_peaks(method="fast")
+    assert not list(tmp_path.iterdir())
+
+
+def gaussian_moments(x, functions):
+    y = sum(a * np.exp(-0.5 * ((x - mu) / sigma) ** 2) for a, mu, sigma in functions)
+    area = np.sum(y) * (x[1] - x[0])
+    mean = np.sum(x * y) / np.sum(y)
+    return area, mean, np.sum((x - mean) ** 2 * y) / np.sum(y)
+
+
+def test_merge_fits_keeps_moments():
+    fits = [((1., 5., 0.2), 4., 6.), ((0.3, 5.15, 0.1), 4.5, 5.5)]
+    merged = Trace._merge_fits(fits, 1.)
+    assert len(merged) == 1
+    (a, mu, sigma), x0, x1 = merged[0]
+    assert (x0, x1) == (4., 6.)
+    x = np.linspace(0., 10., 100001)
+    assert gaussian_moments(x, [(a, mu, sigma)]) == pytest.approx(gaussian_moments(x, [f[0] for f in fits]),
+                                                                  rel=1e-6)
+
+
+def test_merge_fits_on_overlapping_extents():
+    fits = [((1., 5., 0.1), 4., 6.), ((1., 5.25, 0.1), 4., 6.), ((1., 6., 0.1), 5., 7.), ((1., 6.15, 0.1), 5., 7.)]
+    assert [peak[0][1] for peak in Trace._merge_fits(fits, 1.)] == pytest.approx([5., 5.25, 6.075])
+    # Wider extents merge both pairs, and merge again once the merged peaks overlap
+    assert len(Trace._merge_fits(fits, 2.)) == 2
+    assert len(Trace._merge_fits(fits, 4.)) == 1
+    # Negative fits are never merged
+    fits[3] = ((-1., 6.15, 0.1), 5., 7.)
+    assert len(Trace._merge_fits(fits, 1.)) == 4
+
+
+def test_merge_fits_below_resolution():
+    # Fits narrower than the sampling interval extend to the sampling interval
+    fits = [((1., 1.075, 0.005), 1., 1.2), ((1., 1.084, 0.002), 1., 1.2)]
+    assert len(Trace._merge_fits(fits, 1.)) == 2
+    assert len(Trace._merge_fits(fits, 1., 0.008)) == 1
+
+
+def test_detect_peaks_iterative(trace):
+    positions = peak_positions(trace.window(10, 30).detect_peaks(method="iterative"))
+    # One entry per peak, the overlapping analytes 4a and 4b are still two peaks
+    assert np.min(np.diff(positions)) > 0.15
+    for position in WINDOW_PEAKS:
+        assert np.min(np.abs(np.array(positions) - position)) < 0.05
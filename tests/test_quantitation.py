@@ -0,0 +1,59 @@
+import bisect
+
+import numpy as np
+import pytest
+
+import batch
+import util
+from util import quantitation
+
+
+def loop_quantities(time, intensity, peak, settings):
+    """ The original per analyte windows and integration loops of batchQuantitationControl """
+    low = bisect.bisect_left(time, peak[1] - peak[2])
+    high = bisect.bisect_right(time, peak[1] + peak[2])
+    lowBackground = bisect.bisect_left(time, max(peak[1] - settings.backgroundWindow, settings.start))
+    highBackground = bisect.bisect_right(time, min(peak[1] + settings.backgroundWindow, settings.end))
+    background, noise = util.background_noise(intensity[lowBackground:highBackground])
+    signalNoise = (max(intensity[low:high]) - background) / noise
+
+    peakArea = 0
+    backgroundArea = 0
+    totalArea = 0
+    for index, j in enumerate(intensity[low:high]):
+        peakArea += max(j, 0) * (time[low + index] - time[low + index - 1])
+        backgroundArea += max(background, 0) * (time[low + index] - time[low + index - 1])
+        totalArea += max(j - background, 0) * (time[low + index] - time[low + index - 1])
+    peakNoise = np.std(intensity[low:high])
+    return {'low': low, 'high': high, 'lowBackground': lowBackground, 'highBackground': highBackground,
+            'background': background, 'noise': noise, 'signalNoise': signalNoise, 'area': peakArea,
+            'backgroundArea': backgroundArea, 'totalArea': totalArea, 'peakNoise': peakNoise}
+
+
+def test_integrate_matches_loops(traces, settings, analyte_file):
+    peaks = batch.get_peak_list(analyte_file, settings)
+    for trace in traces:
+        time, intensity = np.asarray(trace.x), np.asarray(trace.y)
+        results = quantitation.windows(time, [i[1] for i in peaks], [i[2] for i in peaks], settings.backgroundWindow,
+                                       settings.start, settings.end)
+        for row in results:
+            row['background'], row['noise'] = util.background_noise(
+                intensity[row['lowBackground']:row['highBackground']])
+        quantitation.integrate(time, intensity, results)
+
+        for peak, row in zip(peaks, results):
+            expected = loop_quantities(time, intensity, peak, settings)
+            for field in ('low', 'high', 'lowBackground', 'highBackground'):
+                assert row[field] == expected[field]
+            for field in ('background', 'noise', 'signalNoise', 'area', 'backgroundArea', 'totalArea', 'peakNoise'):
+                assert row[field] == pytest.approx(expected[field], rel=1e-9, abs=1e-12), field
+
+
+def test_integrate_empty_window():
+    time = np.linspace(0., 1., 11)
+    results = quantitation.windows(time, [0.55, 2.], [0.01, 0.1])
+    results['background'], results['noise'] = 0., 1.
+    quantitation.integrate(time, np.ones_like(time), results)
+    assert results['high'][0] == results['low'][0]
+    assert results['area'][0] == 0 and results['totalArea'][0] == 0
+    assert np.isnan(results['maximum'][0])
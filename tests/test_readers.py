@@ -0,0 +1,39 @@
+import numpy as np
+
+import util
+from Trace import Trace
+
+
+def genfromtxt_trace(file, x_col=0, y_col=1, sep="\t"):
+    """ The original two pass reader of Trace.from_file_txt """
+    header_length = 0
+    with open(file, 'r') as fr:
+        for line in fr:
+            if line[0].isdigit():
+                break
+            header_length += 1
+
+    return np.genfromtxt(file, delimiter=sep, skip_header=header_length, usecols=(x_col, y_col),
+                         dtype=Trace.DATA_TYPE)
+
+
+def test_text_export_matches_genfromtxt(example_files):
+    for file in example_files:
+        data, _ = util.read_text_export(file, Trace.DATA_TYPE, x_col=0, y_col=2)
+        np.testing.assert_array_equal(data, genfromtxt_trace(file, x_col=0, y_col=2))
+
+
+def test_text_export_metadata(example_files):
+    trace = Trace.from_file(example_files[0], use_cache=False)
+    assert trace.metadata['Channel'] == "ACQUITY FLR ChA"
+    assert (trace.metadata['x_label'], trace.metadata['x_units']) == ("Time", "min")
+    assert (trace.metadata['y_label'], trace.metadata['y_units']) == ("Value", "EU")
+
+
+def test_text_export_crlf(tmp_path, example_files):
+    with open(example_files[0], 'r') as fr:
+        lines = fr.read().splitlines()
+    file = tmp_path / "crlf.txt"
+    file.write_bytes(("\r\n".join(lines) + "\r\n").encode("utf-8"))
+    data, _ = util.read_text_export(str(file), Trace.DATA_TYPE, x_col=0, y_col=2)
+    np.testing.assert_array_equal(data, genfromtxt_trace(example_files[0], x_col=0, y_col=2))
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import report
+import util
+
+PEAKS = [("G0F", 2., 0.15), ("G1F", 3., 0.15)]
+
+
+def example_payload(tmp_path, overview=True):
+    time = np.linspace(0., 5., 501)
+    intensity = util.gauss_function(time, 10., 2., 0.1) + util.gauss_function(time, 5., 3., 0.1) + 0.5
+    details = []
+    for name, centre, window in PEAKS:
+        low, high = np.searchsorted(time, [centre - window, centre + window])
+        newX = np.linspace(time[low], time[high - 1], 50)
+        coeff = (intensity[(low + high) // 2] - 0.5, centre, 0.1)
+        details.append(report.detailPayload({
+            'fwhm': {'fwhm': util.fwhm(coeff), 'width': util.hwhm(coeff), 'center': centre},
+            'height': coeff[0] / 2 + 0.5, 'NOBAN': {'Background': 0.5, 'Noise': 0.01}, 'residual': 0.95,
+            'i': (name, centre, window), 'low': low, 'high': high, 'data': (time, intensity),
+            'newData': (newX, np.interp(newX, time, intensity)),
+            'newGauss': (newX, util.gauss_function(newX, *coeff) + 0.5)}))
+    return {'Name': "sample", 'Version': "1.0", 'Report': str(tmp_path / "sample.pdf"),
+            'Overview': report.overviewPayload(PEAKS, "sample", time, intensity, 1., 4.) if overview else None,
+            'Details': details}
+
+
+def assert_payloads_equal(payload, expected):
+    for key in ('Name', 'Version', 'Report'):
+        assert payload[key] == expected[key]
+    if expected['Overview'] is None:
+        assert payload['Overview'] is None
+    else:
+        for key in ('peaks', 'name', 'start', 'end'):
+            assert payload['Overview'][key] == expected['Overview'][key]
+        for key in ('time', 'intensity'):
+            np.testing.assert_array_equal(payload['Overview'][key], expected['Overview'][key])
+    assert len(payload['Details']) == len(expected['Details'])
+    for details, expected_details in zip(payload['Details'], expected['Details']):
+        for key in ('fwhm', 'height', 'NOBAN', 'residual', 'i', 'low', 'high'):
+            assert details[key] == expected_details[key]
+        for key in ('newData', 'newGauss', 'data'):
+            for array, expected_array in zip(details[key], expected_details[key]):
+                np.testing.assert_array_equal(array, expected_array)
+
+
+@pytest.mark.parametrize("overview", [True, False])
+def test_payload_round_trip(tmp_path, overview):
+    payload = example_payload(tmp_path, overview)
+    filename = report.payloadName(str(tmp_path), "sample.txt")
+    report.savePayload(filename, payload)
+    loaded = report.loadPayload(filename)
+    # The chromatogram of a detail page is cut to its window
+    assert len(loaded['Details'][0]['data'][0]) == payload['Details'][0]['high']
+    assert_payloads_equal(loaded, payload)
+
+
+def test_render_payload(tmp_path):
+    filename = report.payloadName(str(tmp_path), "sample.txt")
+    report.savePayload(filename, example_payload(tmp_path))
+    assert report.renderPayload(filename, remove=True) == str(tmp_path / "sample.pdf")
+    assert (tmp_path / "sample.pdf").read_bytes().startswith(b"%PDF")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["sample.pdf"]
+
+
+def renderer_state(renderer):
+    ax = renderer.ax
+    lines = [line.get_xydata().tolist() for line in ax.get_lines()]
+    texts = [text.get_text() for text in renderer.legend.get_texts()]
+    return lines, texts, ax.get_title(), ax.get_xlim(), ax.get_ylim()
+
+
+def test_reused_renderer_matches_fresh(tmp_path):
+    details = example_payload(tmp_path)['Details']
+    pdf = report.openReport(str(tmp_path / "report.pdf"), "sample", "1.0")
+    report.resetDetailRenderer()
+    # The second page, rendered after the first one and by a renderer of its own
+    for page in details:
+        report.plotIndividual(pdf, page)
+    reused = report.detailRenderer()
+    fresh = report.DetailPlotRenderer()
+    fresh.render(pdf, details[1])
+    pdf.close()
+    assert renderer_state(reused) == renderer_state(fresh)
+    report.resetDetailRenderer()
+    assert report.detailRenderer() is not reused
+    report.resetDetailRenderer()
@@ -0,0 +1,139 @@
+import shutil
+import struct
+import zipfile
+
+import numpy as np
+import pytest
+
+import batch
+import util
+from util.quantitation import RESULT_TYPE
+from util.results import _memmap_member
+
+
+def example_store(samples=3, analytes=("G0F", "G1F", "G2F")):
+    results = np.zeros((samples, len(analytes)), dtype=RESULT_TYPE)
+    for index, field in enumerate(RESULT_TYPE.names):
+        results[field] = np.arange(results.size).reshape(results.shape) + index
+    if results.size:
+        results['residual'][0, 0] = np.nan
+    return util.ResultStore(["sample %d" % i for i in range(samples)], ["%d*X^1+0" % i for i in range(samples)],
+                            list(analytes), results)
+
+
+def assert_stores_equal(store, expected):
+    np.testing.assert_array_equal(store.samples, expected.samples)
+    np.testing.assert_array_equal(store.calibrations, expected.calibrations)
+    np.testing.assert_array_equal(store.analytes, expected.analytes)
+    assert store.results.dtype == RESULT_TYPE
+    assert store.results.shape == expected.results.shape
+    for field in RESULT_TYPE.names:
+        np.testing.assert_array_equal(store[field], expected[field])
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+@pytest.mark.parametrize("samples, analytes", [(3, ("G0F", "G1F", "G2F")), (3, ()), (0, ("G0F",)), (0, ())])
+def test_store_round_trip(tmp_path, mmap, samples, analytes):
+    store = example_store(samples, analytes)
+    file = str(tmp_path / "results.npz")
+    store.save(file)
+    assert_stores_equal(util.ResultStore.load(file, mmap=mmap), store)
+
+
+def test_store_without_analytes(tmp_path):
+    store = example_store(analytes=())
+    file = str(tmp_path / "results.npz")
+    store.save(file)
+    loaded = util.ResultStore.load(file, mmap=True)
+    assert len(loaded) == 3 and loaded.results.shape == (3, 0)
+    assert loaded.relative_area().shape == (3, 0)
+
+
+def test_save_order(tmp_path):
+    store = example_store(4)
+    file = str(tmp_path / "results.npz")
+    store.save(file, order=np.array([2, 0, 3, 1]), size=3)
+    loaded = util.ResultStore.load(file)
+    order = [2, 0, 3, 1]
+    assert_stores_equal(loaded, util.ResultStore(store.samples[order], store.calibrations[order], store.analytes,
+                                                 store.results[order]))
+
+
+@pytest.mark.parametrize("savez", [np.savez, np.savez_compressed])
+def test_memmap_member_of_savez(tmp_path, savez):
+    store = example_store()
+    file = str(tmp_path / "results.npz")
+    savez(file, samples=store.samples, calibrations=store.calibrations, analytes=store.analytes,
+          results=store.results)
+    assert_stores_equal(util.ResultStore.load(file, mmap=True), store)
+
+
+def test_memmap_member_zip64(tmp_path):
+    # Members with zip64 extra fields in their local headers, behind another (zip64) member
+    results = np.arange(1000, dtype=np.float64).reshape(100, 10)
+    file = str(tmp_path / "zip64.npz")
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, array in (("padding", np.zeros(12345, dtype=np.uint8)), ("results", results)):
+            with archive.open(name + ".npy", 'w', force_zip64=True) as fw:
+                np.lib.format.write_array(fw, array)
+    with zipfile.ZipFile(file) as archive:
+        offset = archive.getinfo("results.npy").header_offset
+    with open(file, 'rb') as fr:
+        fr.seek(offset)
+        header = struct.unpack('<4s5H3I2H', fr.read(30))
+    # The sizes are in the zip64 extra field of the local header
+    assert header[7] == header[8] == 0xFFFFFFFF and header[10] > 0
+    member = _memmap_member(file, "results")
+    assert isinstance(member, np.memmap)
+    np.testing.assert_array_equal(member, results)
+
+
+def test_memmap_member_fortran_order(tmp_path):
+    results = np.asfortranarray(np.arange(12, dtype=np.float64).reshape(3, 4))
+    file = str(tmp_path / "fortran.npz")
+    np.savez(file, results=results)
+    np.testing.assert_array_equal(_memmap_member(file, "results"), results)
+
+
+def test_writer_sorts_samples(tmp_path):
+    store = example_store(4)
+    file = str(tmp_path / "results.npz")
+    writer = util.ResultWriter(file, store.analytes, 5)
+    for index in (3, 1, 0, 2):
+        writer.add(store.samples[index], store.calibrations[index], store.results[index])
+    assert len(writer) == 4
+    assert_stores_equal(writer.close(), store)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["results.npz"]
+
+
+def test_chunks():
+    store = example_store(5)
+    chunks = list(store.chunks(2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    np.testing.assert_array_equal(np.concatenate([chunk['area'] for chunk in chunks]), store['area'])
+
+
+def test_writer_discard(tmp_path):
+    store = example_store(2)
+    file = str(tmp_path / "results.npz")
+    writer = util.ResultWriter(file, store.analytes, 2)
+    writer.add(store.samples[0], store.calibrations[0], store.results[0])
+    writer.discard()
+    assert not list(tmp_path.iterdir())
+    # Discarding a closed writer keeps the store
+    writer = util.ResultWriter(file, store.analytes, 2)
+    writer.close()
+    writer.discard()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["results.npz"]
+
+
+def test_interrupted_batch_removes_rows(tmp_path, monkeypatch, example_files, calibrant_file, analyte_file):
+    def interrupt(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    for file in example_files[:2]:
+        shutil.copy(file, str(tmp_path))
+    monkeypatch.setattr(batch, "processFile", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        batch.run(str(tmp_path), calibrant_file, analyte_file, batch.BatchSettings(processes=1))
+    assert not [path.name for path in tmp_path.iterdir() if path.name.endswith(".npy")]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import scipy.interpolate
+import scipy.signal
+
+import util
+from util import sampling
+
+
+def sine_spline(k=3, points=400):
+    x = np.linspace(0.1, 4 * np.pi - 0.1, points)
+    return scipy.interpolate.InterpolatedUnivariateSpline(x, np.sin(x), k=k)
+
+
+def mixture(x):
+    return sum(util.gauss_function(x, a, mu, sigma) for a, mu, sigma in ((1., 2., 0.3), (0.6, 2.9, 0.25),
+                                                                          (0.3, 4.5, 0.5)))
+
+
+def test_resample_keeps_data_points():
+    x = np.array([0., 1., 1.5, 3.5])
+    grid = util.resample(x, points_per_step=4)
+    assert len(grid) == 4 * (len(x) - 1) + 1
+    np.testing.assert_array_equal(grid[::4], x)
+    assert np.all(np.diff(grid) > 0)
+    np.testing.assert_allclose(np.diff(grid[4:8]), 0.125)
+    np.testing.assert_array_equal(util.resample([2.]), [2.])
+
+
+def test_resample_by_peak_width():
+    x = np.linspace(0., 10., 101)
+    grid = util.resample(x, points_per_step=4, peak_width=0.5, points_per_width=50)
+    assert (grid[0], grid[-1]) == (0., 10.)
+    np.testing.assert_allclose(np.diff(grid), 10. / (len(grid) - 1))
+    assert len(grid) == 1000
+    # The sampling step dominates for wide peaks
+    assert len(util.resample(x, points_per_step=4, peak_width=100.)) == 400
+
+
+@pytest.mark.parametrize("k", [3, 4, 5])
+def test_tck_matches_spline(k):
+    spline = sine_spline(k)
+    smoothed = scipy.interpolate.UnivariateSpline(spline.get_knots(), np.sin(spline.get_knots()), k=k, s=0.1)
+    x = np.linspace(0.1, 4 * np.pi - 0.1, 1001)
+    for f in (spline, smoothed):
+        t, c, degree = sampling._tck(f)
+        assert degree == k and len(t) == len(c) + k + 1
+        np.testing.assert_allclose(scipy.interpolate.splev(x, (t, c, degree)), f(x), atol=1e-12)
+
+
+@pytest.mark.parametrize("k", [3, 4, 5])
+def test_spline_roots_of_sine(k):
+    spline = sine_spline(k)
+    roots, signs = util.spline_roots(spline, 1)
+    np.testing.assert_allclose(roots, np.pi / 2 + np.pi * np.arange(4), atol=1e-5)
+    np.testing.assert_array_equal(signs, [-1, 1, -1, 1])
+    np.testing.assert_allclose(util.inflection_points(spline), np.pi * np.arange(1, 4), atol=1e-4)
+
+
+@pytest.mark.parametrize("nu", [1, 2])
+def test_grid_extrema_match_argrelextrema(nu):
+    x = np.linspace(0., 7., 141)
+    spline = scipy.interpolate.InterpolatedUnivariateSpline(x, mixture(x))
+    grid = util.resample(x)
+    derivative = spline.derivative(nu - 1) if nu > 1 else spline
+    values = derivative(grid)
+    expected = np.sort(np.concatenate([scipy.signal.argrelextrema(values, comparator)[0]
+                                       for comparator in (np.greater, np.less)]))
+    np.testing.assert_array_equal(util.grid_extrema(spline, grid, nu), expected)
+    if nu == 1:
+        # The maxima of the mixture, and the minima between them
+        assert len(expected) == 5
+        np.testing.assert_allclose(grid[expected[[0, 2, 4]]], [2., 2.9, 4.5], atol=0.1)
+
+
+def test_insert_points():
+    grid = np.arange(0., 5.)
+    points = np.array([-0.5, 0.5, 2., 2.25, 4., 4.5])
+    new, indices = util.insert_points(grid, points)
+    np.testing.assert_array_equal(new, np.union1d(grid, points))
+    np.testing.assert_array_equal(new[indices], points)
+    new, indices = util.insert_points(grid, [])
+    np.testing.assert_array_equal(new, grid)
+    assert len(indices) == 0
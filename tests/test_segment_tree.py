@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from util import MaxSegmentTree
+
+
+@pytest.mark.parametrize("length", [1, 2, 5, 8, 13, 100])
+def test_max_segment_tree_matches_brute_force(length):
+    random = np.random.RandomState(length)
+    values = random.normal(size=length)
+    tree = MaxSegmentTree(values)
+    assert tree.max() == values.max() and tree.argmax() == np.argmax(values)
+    for _ in range(50):
+        low = random.randint(length)
+        update = random.normal(size=random.randint(length - low + 1))
+        values[low:low + len(update)] = update
+        tree.update(low, update)
+        assert tree.max() == values.max()
+        assert tree.argmax() == np.argmax(values)
+
+
+def test_max_segment_tree_first_maximum():
+    tree = MaxSegmentTree([1., 3., 2., 3.])
+    assert tree.argmax() == 1
+    tree.update(0, [3.])
+    assert tree.argmax() == 0
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from Trace import Trace
+
+
+def test_memmap_round_trip(traces, tmp_path):
+    trace = traces[0]
+    assert not trace.is_memmap()
+    mapped = trace.to_memmap(str(tmp_path / "trace.npy"))
+    assert mapped.is_memmap() and not mapped.data.flags.writeable
+    np.testing.assert_array_equal(mapped.data, trace.data)
+    assert mapped.metadata == trace.metadata
+    opened = Trace.from_memmap(str(tmp_path / "trace.npy"))
+    assert opened.is_memmap()
+    np.testing.assert_array_equal(opened.data, trace.data)
+    # A window of a memory mapped Trace is a view on the file
+    assert opened.window(10, 30).is_memmap()
+
+
+def test_from_xy_on_disk(tmp_path):
+    x, y = np.linspace(0., 1., 11), np.arange(11.)
+    trace = Trace.from_xy(x, y, filename=str(tmp_path / "trace.npy"))
+    assert trace.is_memmap()
+    np.testing.assert_array_equal(Trace.from_memmap(str(tmp_path / "trace.npy")).y, y)
+
+
+@pytest.mark.parametrize("t0, t1", [(10, 30), (16.2, 16.2), (-5, 2), (60, 1000), (-5, 1000), (1000, 2000),
+                                    (-10, -5), (30, 10)])
+def test_window_matches_mask(traces, t0, t1):
+    trace = traces[0]
+    mask = (trace.x >= t0) & (trace.x <= t1)
+    np.testing.assert_array_equal(trace.window(t0, t1).data, trace.data[mask])
+
+
+def test_window_includes_bounds():
+    trace = Trace.from_xy(np.arange(10.), np.arange(10.))
+    np.testing.assert_array_equal(trace.window(2., 5.).x, [2., 3., 4., 5.])
+    np.testing.assert_array_equal(trace.window(2.5, 2.6).x, [])